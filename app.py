@@ -1,12 +1,35 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
 import plotly.express as px
-from dateutil.relativedelta import relativedelta
-from collections import Counter
 import os
-import numpy as np
+import hashlib
+from datetime import date
+import uuid
 from io import BytesIO
 
+from emplacamento.config import DATA_DIR, DEFAULT_EXCEL_FILE, EXTRACTS_DIR, NOME_COLUNA_CONCESSIONARIO, NOME_COLUNA_ENDERECO, NOME_COLUNA_TELEFONE
+from emplacamento.cube import count_distinct_clients, cube_drilldown, filter_mask
+from emplacamento.export import EXPORT_FORMATS, get_export_file, report_frame
+from emplacamento.forecast import format_prediction_text, get_sales_pitch
+from emplacamento.groups import get_group_members
+from emplacamento.leaderboards import (
+    CONQUEST_WINDOW_MONTHS, SHARE_WINDOW_MONTHS, brand_share, build_conquest_list, get_default_own_brand, get_latest_month,
+    rolling_brand_share, share_leaderboard
+)
+from emplacamento.normalize import describe_rejected_rows
+from emplacamento.background import start_background_load
+from emplacamento.perf import perf_panel_enabled_by_env, stage, start_run, write_perf_log
+from emplacamento.loading import DataLoadError, append_registrations, get_default_source_key, load_data, load_default_dataset, load_new_sources
+from emplacamento.reports import (
+    build_brand_year_pivot, build_forecast_report, build_inactive_clients_report, build_yearly_counts, format_report_dates
+)
+from emplacamento.search import batch_lookup, find_matching_rows, read_batch_keys
+from emplacamento.store import (
+    acquire_loaded_dataset, get_client_groups, get_client_profiles, get_count_cube, get_dataset, get_group_profiles, get_leaderboards,
+    get_memory_report, get_search_index
+)
+
 st.set_page_config(
     page_title="Emplacamentos VANS De Nigris",
     page_icon="🚚",
@@ -63,195 +86,204 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-DATA_DIR = "data"
-DEFAULT_EXCEL_FILE = os.path.join(DATA_DIR, "EMPLACAMENTO ANUAL - VANS.xlsx")
+
 LOGO_COLOR_PATH = os.path.join(DATA_DIR, "logo_denigris_colorido.png")
 LOGO_WHITE_PATH = os.path.join(DATA_DIR, "logo_denigris_branco.png")
 
-NOME_COLUNA_ENDERECO = "ENDEREÇO COMPLETO"
-NOME_COLUNA_TELEFONE = "TELEFONE1"
-NOME_COLUNA_CONCESSIONARIO = "CONCESSIONÁRIO"
-
-@st.cache_data(ttl=3600)
-def load_data(file_path_or_buffer):
-    try:
-        df = pd.read_excel(file_path_or_buffer)
-        if df.empty:
-            st.error("O arquivo Excel não contém dados.")
-            return None
-
-        essential_cols = ["Marca", "Segmento", "NO_CIDADE", "Data emplacamento", "CNPJ CLIENTE", "NOME DO CLIENTE"]
-        missing_cols = [col for col in essential_cols if col not in df.columns]
-        if missing_cols:
-            st.error(f"Erro: Colunas essenciais não encontradas: {', '.join(missing_cols)}")
-            return None
-
-        # Normalização da coluna PLACA (coluna M)
-        placa_col = "PLACA"
-        if placa_col in df.columns:
-            df[placa_col] = df[placa_col].astype(str).str.strip().str.upper()
-            df["PLACA_NORMALIZED"] = df[placa_col].str.replace("-", "").str.replace(" ", "").str.upper()
-        else:
-            df[placa_col] = ""
-            df["PLACA_NORMALIZED"] = ""
-
-        # Normalização da coluna Concessionário
-        concessionario_variations = ["CONCESSIONÁRIO", "concessionário", "Concessionário", "Concessionaria", "CONCESSIONARIO"]
-        found_concessionario_col = next((col for col in concessionario_variations if col in df.columns), None)
-        if found_concessionario_col and found_concessionario_col != NOME_COLUNA_CONCESSIONARIO:
-            df.rename(columns={found_concessionario_col: NOME_COLUNA_CONCESSIONARIO}, inplace=True)
-        if NOME_COLUNA_CONCESSIONARIO not in df.columns:
-            df[NOME_COLUNA_CONCESSIONARIO] = "N/A"
-
-        df["Data emplacamento"] = pd.to_datetime(df["Data emplacamento"], errors='coerce', dayfirst=True)
-        df["CNPJ CLIENTE"] = df["CNPJ CLIENTE"].astype(str).str.strip()
-        df["NOME DO CLIENTE"] = df["NOME DO CLIENTE"].astype(str).str.strip()
-        df[NOME_COLUNA_ENDERECO] = df[NOME_COLUNA_ENDERECO].astype(str).str.strip() if NOME_COLUNA_ENDERECO in df.columns else "N/A"
-        df[NOME_COLUNA_TELEFONE] = df[NOME_COLUNA_TELEFONE].astype(str).str.strip() if NOME_COLUNA_TELEFONE in df.columns else "N/A"
-        df[NOME_COLUNA_CONCESSIONARIO] = df[NOME_COLUNA_CONCESSIONARIO].astype(str).str.strip()
-        df["CNPJ_NORMALIZED"] = df["CNPJ CLIENTE"].str.replace(r"[.\\/-]", "", regex=True)
-        df.dropna(subset=["Data emplacamento", "CNPJ CLIENTE", "NOME DO CLIENTE"], inplace=True)
-        df["Ano"] = df["Data emplacamento"].dt.year
-        df["Mes"] = df["Data emplacamento"].dt.month
-        df["AnoMesStr"] = df["Data emplacamento"].dt.strftime("%Y-%m")
-        df["AnoMesNum"] = (df["Ano"] * 100 + df["Mes"]).astype(int)
-        return df
-    except Exception as e:
-        st.error(f"Erro ao carregar/processar o arquivo: {e}")
-        return None
-
-def get_modes(series):
-    cleaned_series = series.dropna().astype(str)
-    cleaned_series = cleaned_series[cleaned_series != "N/A"]
-    cleaned_series = cleaned_series[cleaned_series != ""]
-    if cleaned_series.empty:
-        return ["N/A"]
-    counts = Counter(cleaned_series)
-    max_count = counts.most_common(1)[0][1]
-    modes = sorted([item for item, count in counts.items() if count == max_count])
-    return modes
-
-def format_list(items):
-    if not items or items == ["N/A"]:
-        return "N/A"
-    return ", ".join(map(str, items))
-
-def calculate_next_purchase_prediction(valid_purchase_dates):
-    if not valid_purchase_dates or len(valid_purchase_dates) < 2:
-        return "Previsão não disponível (histórico insuficiente).", None
-    valid_purchase_dates.sort()
-    last_purchase_date = valid_purchase_dates[-1]
-    intervals_months = []
-    for i in range(1, len(valid_purchase_dates)):
-        delta = relativedelta(valid_purchase_dates[i], valid_purchase_dates[i-1])
-        months_diff = delta.years * 12 + delta.months
-        days_diff = delta.days
-        if months_diff > 0:
-            intervals_months.append(months_diff)
-        elif months_diff == 0 and days_diff > 15:
-            intervals_months.append(0.5)
-    if not intervals_months:
-        return "Previsão não disponível (compras muito próximas ou única).", last_purchase_date
-    avg_interval_months = max(1, sum(intervals_months) / len(intervals_months))
-    predicted_next_date = last_purchase_date + relativedelta(months=int(round(avg_interval_months)))
-    meses = ["Janeiro", "Fevereiro", "Março", "Abril", "Maio", "Junho", "Julho", "Agosto", "Setembro", "Outubro", "Novembro", "Dezembro"]
-    predicted_month_year = f"{meses[predicted_next_date.month - 1]} de {predicted_next_date.year}"
-    prediction_text = f"Próxima compra provável em: **{predicted_month_year}** (intervalo médio: {avg_interval_months:.1f} meses)"
-    return prediction_text, predicted_next_date
-
-def get_sales_pitch(last_purchase_date, predicted_next_date, total_purchases):
-    today = pd.Timestamp.now().normalize()
-    if not last_purchase_date:
-        return "Primeira vez? 🤔 Sem histórico de compras registrado para este cliente."
-    if not isinstance(last_purchase_date, pd.Timestamp):
-        last_purchase_date = pd.to_datetime(last_purchase_date)
-    months_since_last = relativedelta(today, last_purchase_date).years * 12 + relativedelta(today, last_purchase_date).months
-    last_purchase_str = last_purchase_date.strftime("%d/%m/%Y")
-    if predicted_next_date and isinstance(predicted_next_date, pd.Timestamp):
-        months_to_next = relativedelta(predicted_next_date, today).years * 12 + relativedelta(predicted_next_date, today).months
-        days_to_next = relativedelta(predicted_next_date, today).days
-        predicted_month_year = f"{['Janeiro', 'Fevereiro', 'Março', 'Abril', 'Maio', 'Junho', 'Julho', 'Agosto', 'Setembro', 'Outubro', 'Novembro', 'Dezembro'][predicted_next_date.month - 1]} de {predicted_next_date.year}"
-        if months_to_next < 0 or (months_to_next == 0 and days_to_next < -7):
-            return f"🚨 **Atenção!** A compra prevista para **{predicted_month_year}** pode ter passado! Última compra em {last_purchase_str}. Contato urgente!"
-        elif months_to_next <= 1 and days_to_next >= -7:
-            return f"📈 **Oportunidade Quente!** Próxima compra prevista para **{predicted_month_year}**. Ótimo momento para contato! Última compra em {last_purchase_str}."
-        elif months_to_next <= 3:
-            return f"🗓️ **Planeje-se!** Próxima compra prevista para **{predicted_month_year}**. Prepare sua abordagem! Última compra em {last_purchase_str}."
-        else:
-            return f"⏳ Compra prevista para **{predicted_month_year}**. Mantenha o relacionamento aquecido! Última compra em {last_purchase_str}."
-    else:
-        if months_since_last >= 18:
-            return f"🚨 Alerta de inatividade! Faz {months_since_last} meses desde a última compra ({last_purchase_str}). Hora de reativar esse cliente! 📞"
-        elif months_since_last >= 12:
-            return f"👀 Faz {months_since_last} meses desde a última compra ({last_purchase_str}). Que tal um contato para mostrar novidades?"
-        elif months_since_last >= 6:
-            return f"⏳ Já se passaram {months_since_last} meses ({last_purchase_str}). Bom momento para um follow-up."
-        elif total_purchases > 3:
-            return f"👍 Cliente fiel ({total_purchases} compras)! Última compra em {last_purchase_str}. Mantenha o bom trabalho!"
-        else:
-            return f"✅ Compra recente ({last_purchase_str}). Ótimo para fortalecer o relacionamento!"
+# Tempos desta execução; o painel aparece com ?perf=1 na URL ou EMPLACAMENTO_PERF=1
+perf_run = start_run()
+show_perf_panel = st.query_params.get("perf") == "1" or perf_panel_enabled_by_env()
+if "perf_session_id" not in st.session_state:
+    st.session_state.perf_session_id = uuid.uuid4().hex[:12]
 
-if "df_loaded" not in st.session_state:
-    st.session_state.df_loaded = None
+if "dataset_lease" not in st.session_state:
+    st.session_state.dataset_lease = None
 if "data_source_key" not in st.session_state:
     st.session_state.data_source_key = None
+if "default_source_key" not in st.session_state:
+    st.session_state.default_source_key = None
 if "last_upload_info" not in st.session_state:
     st.session_state.last_upload_info = None
+if "ingested_extracts" not in st.session_state:
+    st.session_state.ingested_extracts = set()
+if "ingest_message" not in st.session_state:
+    st.session_state.ingest_message = None
+if "pending_load" not in st.session_state:
+    st.session_state.pending_load = None
+if "failed_source_key" not in st.session_state:
+    st.session_state.failed_source_key = None
+if "upload_hashes" not in st.session_state:
+    st.session_state.upload_hashes = {}
+
+def get_upload_hash(uploaded):
+    # Hash do conteúdo (não do nome/tamanho): identifica a fonte no repositório compartilhado entre sessões.
+    # Calculado uma vez por arquivo enviado (file_id) para não reler os bytes a cada rerun.
+    if uploaded.file_id not in st.session_state.upload_hashes:
+        st.session_state.upload_hashes[uploaded.file_id] = hashlib.sha256(uploaded.getvalue()).hexdigest()
+    return st.session_state.upload_hashes[uploaded.file_id]
+
+def apply_loaded_dataset(pending, dataset_lease):
+    # Troca atômica: a sessão só passa a usar a nova versão quando ela está completa
+    st.session_state.dataset_lease = dataset_lease
+    st.session_state.data_source_key = pending["data_source_key"]
+    st.session_state.failed_source_key = None
+    for key, value in pending["success_state"].items():
+        st.session_state[key] = value
+    if pending["success_message"]:
+        added_rows = len(get_dataset(dataset_lease.dataset_version)) - pending["base_rows"]
+        st.session_state.ingest_message = pending["success_message"].format(added_rows=added_rows)
+
+def start_dataset_load(data_source_key, loader, success_state, error_prefix, success_message=None, failure_state=None, base_rows=0):
+    # Fonte já carregada no processo: troca imediata. Senão a carga roda em segundo plano e a
+    # sessão continua usando (e pesquisando) a base atual até a nova ficar pronta.
+    if data_source_key == st.session_state.failed_source_key:
+        return
+    pending = {
+        "data_source_key": data_source_key,
+        "success_state": success_state,
+        "success_message": success_message,
+        "failure_state": failure_state or {},
+        "error_prefix": error_prefix,
+        "base_rows": base_rows,
+    }
+    dataset_lease = acquire_loaded_dataset(data_source_key)
+    if dataset_lease is not None:
+        apply_loaded_dataset(pending, dataset_lease)
+        return
+    pending["job"] = start_background_load(data_source_key, loader)
+    st.session_state.pending_load = pending
+
+@st.fragment(run_every=0.5)
+def show_load_progress():
+    pending = st.session_state.pending_load
+    if pending is None:
+        return
+    if pending["job"].done:
+        st.rerun()
+    fraction, text = pending["job"].progress()
+    st.progress(fraction, text=text)
+
+pending_load = st.session_state.pending_load
+if pending_load is not None and pending_load["job"].done:
+    st.session_state.pending_load = None
+    load_job = pending_load["job"]
+    if load_job.status == "done":
+        apply_loaded_dataset(pending_load, load_job.lease)
+    else:
+        # Carga com erro: a base anterior (se houver) continua em uso
+        st.session_state.failed_source_key = load_job.data_source_key
+        for key, value in pending_load["failure_state"].items():
+            st.session_state[key] = value
+        if isinstance(load_job.error, DataLoadError):
+            st.error(str(load_job.error))
+        else:
+            st.sidebar.error(f"{pending_load['error_prefix']}: {load_job.error}")
 
 st.sidebar.header("Atualizar Dados")
 uploaded_file = st.sidebar.file_uploader("Selecione o arquivo Excel (.xlsx)", type=["xlsx"], key="file_uploader")
+extract_files = st.sidebar.file_uploader(
+    "Acrescentar extratos mensais (.xlsx) à base atual",
+    type=["xlsx"],
+    accept_multiple_files=True,
+    key="extract_uploader"
+)
 
 load_from_default = False
 load_from_upload = False
-
-if uploaded_file is not None:
-    current_upload_info = (uploaded_file.name, uploaded_file.size)
-    if current_upload_info != st.session_state.last_upload_info:
-        load_from_upload = True
-        st.session_state.last_upload_info = current_upload_info
-        st.sidebar.info(f"Arquivo 	'{uploaded_file.name}'	 selecionado.")
-    elif st.session_state.df_loaded is None:
-        load_from_upload = True
-elif st.session_state.df_loaded is None:
-    load_from_default = True
+refresh_default = False
+
+# Uma carga por vez: arquivos novos são considerados quando a carga em andamento terminar
+if st.session_state.pending_load is None:
+    if uploaded_file is not None:
+        current_upload_info = (uploaded_file.name, get_upload_hash(uploaded_file))
+        if current_upload_info != st.session_state.last_upload_info:
+            load_from_upload = True
+            st.session_state.last_upload_info = current_upload_info
+            st.sidebar.info(f"Arquivo 	'{uploaded_file.name}'	 selecionado.")
+        elif st.session_state.dataset_lease is None:
+            load_from_upload = True
+    elif st.session_state.dataset_lease is None:
+        load_from_default = True
+    elif st.session_state.default_source_key is not None and os.path.exists(DEFAULT_EXCEL_FILE):
+        # Novos extratos na pasta (ou arquivo padrão alterado) desde a última carga desta sessão
+        refresh_default = get_default_source_key() != st.session_state.default_source_key
 
 if load_from_upload:
-    try:
-        uploaded_content = BytesIO(uploaded_file.getvalue())
-        st.session_state.df_loaded = load_data(uploaded_content)
-        if st.session_state.df_loaded is not None:
-            st.session_state.data_source_key = f"upload_{uploaded_file.name}_{uploaded_file.size}"
-            st.sidebar.success("Dados do arquivo carregado!")
-            st.rerun()
-        else:
-            st.session_state.data_source_key = None
-            st.session_state.last_upload_info = None
-    except Exception as e:
-        st.sidebar.error(f"Erro crítico ao processar upload: {e}")
-        st.session_state.df_loaded = None
-        st.session_state.data_source_key = None
-        st.session_state.last_upload_info = None
+    upload_source_key = f"upload_{get_upload_hash(uploaded_file)}"
+    upload_bytes = uploaded_file.getvalue()
+    start_dataset_load(
+        upload_source_key,
+        lambda: load_data(BytesIO(upload_bytes)),
+        success_state={"default_source_key": None, "ingested_extracts": set()},
+        error_prefix="Erro crítico ao processar upload",
+        success_message="Dados do arquivo carregado!"
+    )
 
 elif load_from_default:
     if os.path.exists(DEFAULT_EXCEL_FILE):
-        try:
-            st.session_state.df_loaded = load_data(DEFAULT_EXCEL_FILE)
-            if st.session_state.df_loaded is not None:
-                st.session_state.data_source_key = "default"
-                st.sidebar.info(f"Usando arquivo padrão: {os.path.basename(DEFAULT_EXCEL_FILE)}")
-            else:
-                st.session_state.data_source_key = None
-        except Exception as e:
-            st.sidebar.error(f"Erro crítico ao carregar arquivo padrão: {e}")
-            st.session_state.df_loaded = None
-            st.session_state.data_source_key = None
+        # A data de modificação e a lista de extratos fazem parte da chave: mudanças geram nova versão
+        default_source_key = get_default_source_key()
+        start_dataset_load(
+            default_source_key,
+            load_default_dataset,
+            success_state={"default_source_key": default_source_key},
+            error_prefix="Erro crítico ao carregar arquivo padrão",
+            success_message=f"Usando arquivo padrão: {os.path.basename(DEFAULT_EXCEL_FILE)}"
+        )
     else:
         st.sidebar.warning(f"Arquivo padrão não encontrado em {DEFAULT_EXCEL_FILE}. Faça upload de um arquivo.")
-        st.session_state.df_loaded = None
-        st.session_state.data_source_key = None
-
-df_full = st.session_state.get("df_loaded")
 
+elif refresh_default:
+    default_source_key = get_default_source_key()
+    current_df = get_dataset(st.session_state.dataset_lease.dataset_version)
+    same_default_file = default_source_key.rsplit("_", 1)[0] == st.session_state.default_source_key.rsplit("_", 1)[0]
+    # Mesmo arquivo padrão: só os extratos novos são lidos e acrescentados à versão atual
+    base_df = current_df if same_default_file else None
+    if st.session_state.data_source_key == st.session_state.default_source_key or base_df is None:
+        refreshed_source_key = default_source_key
+    else:
+        refreshed_source_key = f"{st.session_state.data_source_key}+{default_source_key}"
+    start_dataset_load(
+        refreshed_source_key,
+        lambda: load_default_dataset(base_df),
+        success_state={"default_source_key": default_source_key},
+        error_prefix=f"Erro ao acrescentar extratos da pasta {EXTRACTS_DIR}",
+        failure_state={"default_source_key": None}
+    )
+
+new_extract_files = [
+    extract for extract in (extract_files or [])
+    if (extract.name, get_upload_hash(extract)) not in st.session_state.ingested_extracts
+]
+if new_extract_files and st.session_state.dataset_lease is not None and st.session_state.pending_load is None:
+    base_df = get_dataset(st.session_state.dataset_lease.dataset_version)
+    extracts_info = sorted((extract.name, get_upload_hash(extract)) for extract in new_extract_files)
+    extracts_key = hashlib.sha256(repr(extracts_info).encode()).hexdigest()[:12]
+    appended_source_key = f"{st.session_state.data_source_key}+extratos_{extracts_key}"
+    extract_sources = [BytesIO(extract.getvalue()) for extract in new_extract_files]
+    start_dataset_load(
+        appended_source_key,
+        lambda: append_registrations(base_df, load_new_sources(base_df, extract_sources)),
+        success_state={"ingested_extracts": st.session_state.ingested_extracts | set(extracts_info)},
+        error_prefix="Erro ao acrescentar extratos",
+        success_message=f"{len(new_extract_files)} extrato(s) processado(s): {{added_rows}} novos emplacamentos acrescentados.",
+        base_rows=len(base_df)
+    )
+
+if st.session_state.pending_load is not None:
+    with st.sidebar:
+        show_load_progress()
+
+if st.session_state.ingest_message:
+    st.sidebar.success(st.session_state.ingest_message)
+    st.session_state.ingest_message = None
+
+dataset_lease = st.session_state.get("dataset_lease")
+df_full = get_dataset(dataset_lease.dataset_version) if dataset_lease is not None else None
+
+if df_full is None and st.session_state.pending_load is not None:
+    st.info("⏳ Carregando a base de dados... acompanhe o progresso na barra lateral.")
+    st.stop()
 if df_full is None or df_full.empty:
     st.warning("Os dados não puderam ser carregados ou estão vazios. Verifique o arquivo ou a mensagem de erro acima.")
     st.stop()
@@ -277,50 +309,97 @@ all_brands = sorted(df_full["Marca"].dropna().unique())
 selected_brands = st.sidebar.multiselect("Filtrar por Marca:", all_brands, key="brand_filter")
 all_segments = sorted(df_full["Segmento"].dropna().unique())
 selected_segments = st.sidebar.multiselect("Filtrar por Segmento:", all_segments, key="segment_filter")
+group_clients = st.sidebar.checkbox(
+    "Agrupar filiais e grafias do mesmo cliente",
+    key="group_clients",
+    help="Une CNPJs com a mesma raiz (8 primeiros dígitos) e razões sociais equivalentes. Busca, previsão e relatórios passam a considerar o grupo."
+)
 
-df_display = df_full.copy()
-if selected_brands:
-    df_display = df_display[df_display["Marca"].isin(selected_brands)]
-if selected_segments:
-    df_display = df_display[df_display["Segmento"].isin(selected_segments)]
+with st.sidebar.expander("🧮 Uso de memória dos dados"):
+    memoria = get_memory_report(dataset_lease.dataset_version, df_full)
+    total_antes, total_depois = memoria.loc["TOTAL", ["Antes (KB)", "Depois (KB)"]]
+    st.caption(f"{total_antes / 1024:.1f} MB → {total_depois / 1024:.1f} MB ({total_antes / max(total_depois, 1):.1f}x menor)")
+    st.dataframe(memoria, use_container_width=True)
+
+rejected_rows = describe_rejected_rows(df_full.attrs.get("rejected_rows", {}))
+if rejected_rows:
+    with st.sidebar.expander(f"⚠️ {sum(rows for _, rows in rejected_rows)} linhas descartadas na carga"):
+        st.dataframe(pd.DataFrame(rejected_rows, columns=["Motivo", "Linhas"]), use_container_width=True, hide_index=True)
+
+export_format = st.sidebar.radio("Formato dos downloads:", options=list(EXPORT_FORMATS), format_func=str.upper, horizontal=True, key="export_format")
+
+with stage("filtro") as rec:
+    row_mask = filter_mask(df_full, selected_brands, selected_segments)
+    rec["rows"] = int(row_mask.sum())
+dataset_version = dataset_lease.dataset_version
+
+def export_download_button(label, report_type, file_base_name, builder, extra_key=()):
+    # Arquivo gerado uma vez por (versão da base, filtros, relatório, formato) e servido do disco depois.
+    # O arquivo só é montado no clique (data como função), não a cada rerun em que o botão aparece.
+    export_filters = (tuple(selected_brands), tuple(selected_segments), group_clients) + tuple(extra_key)
+    current_format = export_format
+
+    def read_export_file():
+        export_path = get_export_file(dataset_version, export_filters, report_type, current_format, builder)
+        with open(export_path, "rb") as export_file:
+            return export_file.read()
+
+    st.download_button(
+        label=f"{label} ({current_format.upper()})",
+        data=read_export_file,
+        file_name=f"{file_base_name}.{current_format}",
+        mime=EXPORT_FORMATS[current_format],
+        key=f"download_{report_type}"
+    )
+with stage("perfis_clientes") as rec:
+    # Com o agrupamento ligado, os perfis são por GRUPO_ID em vez de CNPJ
+    client_groups = get_client_groups(dataset_version, df_full) if group_clients else None
+    if group_clients:
+        client_profiles = get_group_profiles(dataset_version, tuple(selected_brands), tuple(selected_segments), df_full, row_mask)
+    else:
+        client_profiles = get_client_profiles(dataset_version, tuple(selected_brands), tuple(selected_segments), df_full, row_mask)
+    rec["rows"] = len(client_profiles)
 
 st.divider()
 
 if search_button and search_query:
     st.markdown(f"### Resultados da Busca por: '{search_query}'")
-    query_placa_normalized = search_query.replace("-", "").replace(" ", "").upper()
-    query_cnpj_normalized = ''.join(filter(str.isdigit, str(search_query)))
-
-    # Busca exata por placa
-    df_found = df_display[df_display["PLACA_NORMALIZED"] == query_placa_normalized]
-    if df_found.empty and len(query_cnpj_normalized) >= 11:
-        # Busca exata por CNPJ normalizado
-        df_found = df_display[df_display["CNPJ_NORMALIZED"] == query_cnpj_normalized]
-    if df_found.empty:
-        # Busca por nome (parcial, case-insensitive)
-        df_found = df_display[df_display["NOME DO CLIENTE"].str.contains(search_query, case=False, na=False)]
+    search_index = get_search_index(dataset_version, df_full)
+    with stage("busca") as rec:
+        df_found = df_full.iloc[find_matching_rows(search_index, search_query, row_mask)]
+        rec["rows"] = len(df_found)
 
     if df_found.empty:
         st.warning("Cliente ou placa não encontrado na base de dados (considerando os filtros aplicados, se houver).")
     else:
-        unique_cnpjs = df_found["CNPJ_NORMALIZED"].unique()
+        client_key = "CNPJ_NORMALIZED"
+        if group_clients:
+            client_key = "GRUPO_ID"
+            df_found = df_found.assign(GRUPO_ID=client_groups["GRUPO_ID"].reindex(df_found["CNPJ_NORMALIZED"]).to_numpy())
+        unique_cnpjs = df_found[client_key].unique()
+        cnpj_escolhido = unique_cnpjs[0]
         if len(unique_cnpjs) > 1:
-            cnpj_options = df_found.drop_duplicates('CNPJ_NORMALIZED')[["NOME DO CLIENTE", "CNPJ CLIENTE", "CNPJ_NORMALIZED"]]
+            cnpj_options = df_found.drop_duplicates(client_key)[["NOME DO CLIENTE", "CNPJ CLIENTE", client_key]]
+            if group_clients:
+                # Grupos aparecem com o nome mais frequente do grupo, não com a grafia da linha encontrada
+                cnpj_options = cnpj_options.assign(**{"NOME DO CLIENTE": client_groups.drop_duplicates("GRUPO_ID").set_index("GRUPO_ID")["GrupoNome"].reindex(cnpj_options["GRUPO_ID"]).to_numpy()})
             cnpj_labels = [f"{row['NOME DO CLIENTE']} ({row['CNPJ CLIENTE']})" for idx, row in cnpj_options.iterrows()]
             cnpj_selected = st.selectbox("Múltiplos clientes encontrados. Selecione o desejado:", options=cnpj_labels)
             idx_selected = cnpj_labels.index(cnpj_selected)
-            cnpj_escolhido = cnpj_options.iloc[idx_selected]["CNPJ_NORMALIZED"]
-            df_found = df_found[df_found["CNPJ_NORMALIZED"] == cnpj_escolhido]
-
-        client_df_sorted = df_found.sort_values(by="Data emplacamento", ascending=False)
-        latest_record = client_df_sorted.iloc[0]
-        client_name = latest_record["NOME DO CLIENTE"]
-        client_cnpj_formatted = latest_record["CNPJ CLIENTE"]
-        client_address = latest_record.get(NOME_COLUNA_ENDERECO, "N/A")
-        client_phone = latest_record.get(NOME_COLUNA_TELEFONE, "N/A")
-        client_city = latest_record.get("NO_CIDADE", "N/A")
-        modelo_mais_comprado = format_list(get_modes(client_df_sorted["Modelo"])) if "Modelo" in client_df_sorted.columns else "N/A"
-        concessionario_mais_frequente = format_list(get_modes(client_df_sorted[NOME_COLUNA_CONCESSIONARIO])) if NOME_COLUNA_CONCESSIONARIO in client_df_sorted.columns else "N/A"
+            cnpj_escolhido = cnpj_options.iloc[idx_selected][client_key]
+
+        # Perfil pré-calculado do cliente (ou do grupo) e todas as suas linhas (respeitando os filtros)
+        client_profile = client_profiles.loc[cnpj_escolhido]
+        client_cnpjs = get_group_members(client_groups, cnpj_escolhido) if group_clients else [cnpj_escolhido]
+        client_positions = np.concatenate([search_index["cnpj"][cnpj] for cnpj in client_cnpjs if cnpj in search_index["cnpj"]])
+        client_df_sorted = df_full.iloc[client_positions[row_mask[client_positions]]].sort_values(by="Data emplacamento", ascending=False)
+        client_name = client_groups.loc[client_cnpjs[0], "GrupoNome"] if group_clients else client_profile["NOME DO CLIENTE"]
+        client_cnpj_formatted = client_profile["CNPJ CLIENTE"]
+        client_address = client_profile.get(NOME_COLUNA_ENDERECO, "N/A")
+        client_phone = client_profile.get(NOME_COLUNA_TELEFONE, "N/A")
+        client_city = client_profile.get("NO_CIDADE", "N/A")
+        modelo_mais_comprado = client_profile["ModeloMaisComprado"]
+        concessionario_mais_frequente = client_profile["ConcessionarioMaisFrequente"]
 
         st.subheader(f"Detalhes de: {client_name}")
         col1_info, col2_info = st.columns(2)
@@ -333,12 +412,19 @@ if search_button and search_query:
             st.markdown(f"<div class='info-card'><span class='label'>Telefone:</span><span class='value'>{client_phone}</span></div>", unsafe_allow_html=True)
             st.markdown(f"<div class='info-card'><span class='label'>Concessionário mais frequente:</span><span class='value'>{concessionario_mais_frequente}</span></div>", unsafe_allow_html=True)
 
+        if group_clients and len(client_cnpjs) > 1:
+            group_names = df_full.iloc[client_positions][["CNPJ CLIENTE", "NOME DO CLIENTE"]].drop_duplicates("CNPJ CLIENTE")
+            st.caption(f"🏢 Grupo com {len(client_cnpjs)} CNPJs: " + "; ".join(
+                f"{nome} ({cnpj})" for cnpj, nome in group_names.itertuples(index=False, name=None)
+            ))
+
         st.markdown("#### Análise e Histórico")
-        total_purchases = len(client_df_sorted)
-        first_purchase_date = client_df_sorted["Data emplacamento"].min()
-        last_purchase_date = client_df_sorted["Data emplacamento"].max()
-        valid_purchase_dates = client_df_sorted["Data emplacamento"].dropna().tolist()
-        prediction_text, predicted_next_date = calculate_next_purchase_prediction(valid_purchase_dates)
+        total_purchases = int(client_profile["TotalCompras"])
+        first_purchase_date = client_profile["PrimeiraCompra"]
+        last_purchase_date = client_profile["UltimaCompra"]
+        avg_interval_months = client_profile["IntervaloMedioMeses"]
+        predicted_next_date = client_profile["ProximaCompraPrevista"] if pd.notna(client_profile["ProximaCompraPrevista"]) else None
+        prediction_text = format_prediction_text(total_purchases, avg_interval_months, predicted_next_date)
         sales_pitch = get_sales_pitch(last_purchase_date, predicted_next_date, total_purchases)
         col1_insight, col2_predict = st.columns(2)
         with col1_insight:
@@ -366,42 +452,56 @@ if search_button and search_query:
         if "Data" in client_df_display.columns:
             client_df_display["Data"] = pd.to_datetime(client_df_display["Data"], errors="coerce").dt.strftime("%d/%m/%Y")
         st.dataframe(client_df_display, use_container_width=True)
+        export_download_button(
+            "📥 Baixar Histórico do Cliente", "historico", f"historico_{cnpj_escolhido}",
+            lambda: client_df_display, extra_key=(cnpj_escolhido,)
+        )
 else:
     st.subheader("Resumo Geral da Base de Dados")
     st.markdown("*(Considerando os filtros aplicados na barra lateral, se houver)*")
-    if df_display.empty:
+    # Resumo servido a partir do cubo de contagens: o custo depende do número de células, não de linhas
+    count_cube = get_count_cube(dataset_version, df_full)
+    with stage("resumo_cubo") as rec:
+        cell_mask = filter_mask(count_cube["celulas"], selected_brands, selected_segments)
+        cube_cells = count_cube["celulas"][cell_mask]
+        rec["rows"] = len(cube_cells)
+    if cube_cells.empty:
         st.warning("Nenhum dado disponível para exibir com os filtros selecionados.")
     else:
-        total_emplacamentos = len(df_display)
-        total_clientes = df_display["CNPJ_NORMALIZED"].nunique()
-        data_inicio = df_display["Data emplacamento"].min()
-        data_fim = df_display["Data emplacamento"].max()
+        total_emplacamentos = int(cube_cells["Count"].sum())
+        total_clientes = count_distinct_clients(count_cube, selected_brands, selected_segments)
+        periodos = (cube_cells["Ano"].astype(int) * 100 + cube_cells["Mes"].astype(int))
+        periodo_inicio = f"{periodos.min() % 100:02d}/{periodos.min() // 100}" if not periodos.empty else "N/A"
+        periodo_fim = f"{periodos.max() % 100:02d}/{periodos.max() // 100}" if not periodos.empty else "N/A"
         col1_res, col2_res, col3_res = st.columns(3)
         col1_res.metric("Total de Emplacamentos", total_emplacamentos)
         col2_res.metric("Clientes Únicos", total_clientes)
-        col3_res.metric("Período Coberto", f"{data_inicio.strftime('%m/%Y') if pd.notna(data_inicio) else 'N/A'} a {data_fim.strftime('%m/%Y') if pd.notna(data_fim) else 'N/A'}")
+        col3_res.metric("Período Coberto", f"{periodo_inicio} a {periodo_fim}")
         st.markdown("#### Emplacamentos por Ano")
-        emplac_por_ano = df_display.dropna(subset=["Ano"]).groupby("Ano").size().reset_index(name="Count")
+        emplac_por_ano = build_yearly_counts(cube_cells)
         if not emplac_por_ano.empty:
-            emplac_por_ano["Ano"] = emplac_por_ano["Ano"].astype(int)
-            fig_ano = px.bar(emplac_por_ano, x="Ano", y="Count", title="Total de Emplacamentos por Ano", labels={'Ano': 'Ano', 'Count': 'Quantidade'})
-            fig_ano.update_layout(xaxis_type='category')
-            st.plotly_chart(fig_ano, use_container_width=True)
+            with stage("grafico_plotly", rows=len(emplac_por_ano)):
+                fig_ano = px.bar(emplac_por_ano, x="Ano", y="Count", title="Total de Emplacamentos por Ano", labels={'Ano': 'Ano', 'Count': 'Quantidade'})
+                fig_ano.update_layout(xaxis_type='category')
+                st.plotly_chart(fig_ano, use_container_width=True)
         else:
             st.info("Não há dados suficientes para gerar o gráfico de emplacamentos por ano.")
         st.markdown("#### Emplacamentos por Marca e Ano")
-        emplac_marca_ano = df_display.dropna(subset=["Ano", "Marca"]).groupby(["Ano", "Marca"]).size().reset_index(name="Count")
-        if not emplac_marca_ano.empty:
-            emplac_marca_ano["Ano"] = emplac_marca_ano["Ano"].astype(int)
-            try:
-                pivot_marca_ano = emplac_marca_ano.pivot(index="Marca", columns="Ano", values="Count").fillna(0).astype(int)
-                pivot_marca_ano["Total"] = pivot_marca_ano.sum(axis=1)
-                pivot_marca_ano = pivot_marca_ano.sort_values("Total", ascending=False)
-                st.dataframe(pivot_marca_ano, use_container_width=True)
-            except Exception as pivot_error:
-                st.warning(f"Não foi possível gerar a tabela de emplacamentos por marca e ano: {pivot_error}")
-        else:
+        try:
+            pivot_marca_ano = build_brand_year_pivot(cube_cells)
+        except Exception as pivot_error:
+            st.warning(f"Não foi possível gerar a tabela de emplacamentos por marca e ano: {pivot_error}")
+            pivot_marca_ano = None
+        if pivot_marca_ano is not None and not pivot_marca_ano.empty:
+            st.dataframe(pivot_marca_ano, use_container_width=True)
+            export_download_button("📥 Baixar Emplacamentos por Marca e Ano", "marca_ano", "emplacamentos_marca_ano", lambda: report_frame(pivot_marca_ano, "Marca"))
+        elif pivot_marca_ano is not None:
             st.info("Não há dados suficientes para gerar a tabela de emplacamentos por marca e ano.")
+        st.markdown("#### Detalhamento por Cidade ou Concessionário")
+        drill_labels = {"NO_CIDADE": "Cidade", NOME_COLUNA_CONCESSIONARIO: "Concessionário"}
+        drill_dimension = st.radio("Detalhar por:", options=list(drill_labels), format_func=drill_labels.get, horizontal=True, key="drill_dimension")
+        drilldown = cube_drilldown(count_cube, selected_brands, selected_segments, drill_dimension)
+        st.dataframe(drilldown.rename_axis(drill_labels[drill_dimension]), use_container_width=True)
 
 st.sidebar.divider()
 if os.path.exists(LOGO_WHITE_PATH):
@@ -409,59 +509,167 @@ if os.path.exists(LOGO_WHITE_PATH):
 st.sidebar.markdown("© De Nigris Distribuidora")
 
 
+# --- Busca em lote: lista de CNPJs/placas resolvida de uma vez ---
+st.divider()
+st.subheader("📋 Busca em Lote")
+col1_lote, col2_lote = st.columns(2)
+with col1_lote:
+    batch_text = st.text_area("Cole os CNPJs ou placas (um por linha):", "", key="batch_text", height=150)
+with col2_lote:
+    batch_file = st.file_uploader("Ou envie uma lista (.csv ou .xlsx, chaves na 1ª coluna):", type=["csv", "xlsx"], key="batch_file")
+
+if st.button("🔎 Buscar Lista", key="batch_button"):
+    try:
+        batch_keys = read_batch_keys(batch_text, batch_file)
+    except Exception as e:
+        st.error(f"Não foi possível ler a lista enviada: {e}")
+        batch_keys = []
+    if not batch_keys:
+        st.warning("Informe ao menos um CNPJ ou placa.")
+    else:
+        with stage("busca_lote") as rec:
+            resultado_lote = batch_lookup(batch_keys, df_full, row_mask, client_profiles, client_groups)
+            rec["rows"] = len(resultado_lote)
+        encontrados = (resultado_lote["Encontrado por"] != "Não encontrado").sum()
+        st.info(f"{encontrados} de {len(resultado_lote)} chaves encontradas (considerando os filtros aplicados, se houver).")
+        resultado_lote = format_report_dates(resultado_lote, ["UltimaCompra", "ProximaCompraPrevista"])
+        st.dataframe(resultado_lote, use_container_width=True)
+
+        export_download_button(
+            "📥 Baixar Resultado da Busca em Lote", "busca_lote", "busca_em_lote",
+            lambda: resultado_lote, extra_key=(date.today().isoformat(), tuple(batch_keys))
+        )
+
 # --- NOVO: Botão para listar clientes que compraram há mais de 1 ano e ainda não compraram em 2025 ---
 st.divider()
 st.subheader("📌 Oportunidades de Recompra")
 
 if st.button("🔍 Listar Clientes Inativos ( > 1 ano sem comprar )"):
-    hoje = pd.Timestamp.now()
-    ano_atual = hoje.year
-
-    # Última compra de cada cliente
-    ultima_compra = df_display.groupby("CNPJ_NORMALIZED")["Data emplacamento"].max().reset_index()
-    ultima_compra = ultima_compra.rename(columns={"Data emplacamento": "UltimaCompra"})
-
-    # Total de compras por cliente
-    total_compras = df_display.groupby("CNPJ_NORMALIZED").size().reset_index(name="TotalCompras")
-
-    # Juntar infos
-    clientes_info = pd.merge(ultima_compra, total_compras, on="CNPJ_NORMALIZED", how="left")
-
-    # Clientes que não compraram no ano atual e cuja última compra foi há mais de 12 meses
-    clientes_info = clientes_info[clientes_info["UltimaCompra"].notna()]
-    clientes_info["MesesSemCompra"] = ((hoje - clientes_info["UltimaCompra"]) / pd.Timedelta(days=30)).astype(int)
-    clientes_inativos = clientes_info[
-        (clientes_info["UltimaCompra"].dt.year < ano_atual) & 
-        (clientes_info["MesesSemCompra"] > 12)
-    ].copy()
+    with stage("lista_inativos") as rec:
+        clientes_inativos = build_inactive_clients_report(client_profiles)
+        rec["rows"] = len(clientes_inativos)
 
     if clientes_inativos.empty:
         st.success("✅ Nenhum cliente inativo encontrado! Todos os clientes ativos compraram no último ano.")
     else:
-        # Trazer dados adicionais (Nome, CNPJ e Cidade)
-        clientes_inativos = clientes_inativos.merge(
-            df_display[["CNPJ_NORMALIZED", "NOME DO CLIENTE", "CNPJ CLIENTE", "NO_CIDADE"]].drop_duplicates(),
-            on="CNPJ_NORMALIZED",
-            how="left"
+        st.warning(f"🚨 {len(clientes_inativos)} clientes estão há mais de 1 ano sem comprar!")
+
+        st.dataframe(clientes_inativos, use_container_width=True)
+
+        # Botão para download (XLSX ou CSV, conforme a barra lateral)
+        export_download_button(
+            "📥 Baixar Lista de Clientes Inativos", "inativos", "clientes_inativos",
+            lambda: clientes_inativos, extra_key=(date.today().isoformat(),)
         )
 
-        clientes_inativos = clientes_inativos[[
-            "NOME DO CLIENTE", "CNPJ CLIENTE", "NO_CIDADE", "UltimaCompra", "TotalCompras", "MesesSemCompra"
-        ]].sort_values(by="MesesSemCompra", ascending=False)
+# --- Ranking de clientes com próxima compra prevista dentro do horizonte escolhido ---
+st.divider()
+st.subheader("🔮 Oportunidades previstas")
+horizonte_dias = st.selectbox(
+    "Compras previstas nos próximos:",
+    options=[30, 60, 90, 180, 365],
+    index=2,
+    format_func=lambda dias: f"{dias} dias",
+    key="forecast_horizon"
+)
 
-        clientes_inativos["UltimaCompra"] = clientes_inativos["UltimaCompra"].dt.strftime("%d/%m/%Y")
+if st.button("📅 Listar Oportunidades Previstas"):
+    with stage("oportunidades_previstas") as rec:
+        oportunidades = build_forecast_report(client_profiles, horizonte_dias)
+        rec["rows"] = len(oportunidades)
 
-        st.warning(f"🚨 {len(clientes_inativos)} clientes estão há mais de 1 ano sem comprar!")
+    if oportunidades.empty:
+        st.info("Nenhum cliente com compra prevista dentro do horizonte selecionado.")
+    else:
+        st.success(f"📈 {len(oportunidades)} clientes com compra prevista até {horizonte_dias} dias (incluindo previsões já vencidas).")
 
-        st.dataframe(clientes_inativos, use_container_width=True)
+        st.dataframe(oportunidades, use_container_width=True)
 
-        # Botão para download em XLSX
-        excel_buffer = BytesIO()
-        clientes_inativos.to_excel(excel_buffer, index=False, engine='openpyxl')
-        excel_buffer.seek(0)
-        st.download_button(
-            label="📥 Baixar Lista de Clientes Inativos (XLSX)",
-            data=excel_buffer,
-            file_name="clientes_inativos.xlsx",
-            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+        export_download_button(
+            "📥 Baixar Oportunidades Previstas", "previsao", "oportunidades_previstas",
+            lambda: oportunidades, extra_key=(date.today().isoformat(), horizonte_dias)
         )
+
+# --- Placar de marcas: participação por cidade/concessionário e clientes que compraram da concorrência ---
+st.divider()
+st.subheader("🏆 Participação de Mercado e Conquistas")
+st.markdown("*(Considera o filtro de Segmento da barra lateral; o filtro de Marca não se aplica à participação)*")
+leaderboards = get_leaderboards(dataset_version, df_full)
+latest_month = get_latest_month(leaderboards)
+if latest_month is None:
+    st.info("Não há dados suficientes para calcular a participação de mercado.")
+else:
+    board_labels = {"NO_CIDADE": "Cidade", NOME_COLUNA_CONCESSIONARIO: "Concessionário"}
+    col1_placar, col2_placar, col3_placar, col4_placar = st.columns(4)
+    with col1_placar:
+        board_dimension = st.radio("Placar por:", options=list(board_labels), format_func=board_labels.get, horizontal=True, key="board_dimension")
+    with col2_placar:
+        default_own_brand = get_default_own_brand(all_brands)
+        own_brand = st.selectbox(
+            "Marca própria:", all_brands, index=all_brands.index(default_own_brand) if default_own_brand is not None else None, key="own_brand"
+        )
+    with col3_placar:
+        share_window = st.selectbox(
+            "Janela da participação:", options=[3, SHARE_WINDOW_MONTHS, 12], index=1, format_func=lambda meses: f"{meses} meses", key="share_window"
+        )
+    with col4_placar:
+        top_n = st.selectbox("Ranking (top N):", options=[10, 20, 50, 100], index=0, key="board_top_n")
+    st.caption(f"Janela atual: {share_window} meses até {latest_month % 100:02d}/{latest_month // 100}, comparada com os {share_window} meses anteriores.")
+
+    with stage("placar_participacao") as rec:
+        share = brand_share(leaderboards, board_dimension, selected_segments, share_window)
+        placar = share_leaderboard(share, own_brand, top_n)
+        rec["rows"] = len(share)
+    if placar.empty:
+        st.info("Nenhum emplacamento na janela selecionada.")
+    else:
+        st.markdown(f"#### Top {top_n} por {board_labels[board_dimension]}")
+        st.dataframe(placar.rename_axis(board_labels[board_dimension]), use_container_width=True)
+
+        board_value = st.selectbox(
+            f"Detalhar {board_labels[board_dimension].lower()}:", options=[None, *share.index.get_level_values(0).unique()],
+            format_func=lambda valor: "Todas" if valor is None else valor, key="board_value"
+        )
+        with stage("participacao_movel") as rec:
+            share_series = rolling_brand_share(leaderboards, board_dimension, board_value, selected_segments, share_window)
+            rec["rows"] = len(share_series)
+        if not share_series.empty:
+            fig_share = px.line(
+                share_series, x="Período", y="Participação (%)", color="Marca",
+                title=f"Participação móvel ({share_window} meses) - {board_value or 'Todas'}"
+            )
+            st.plotly_chart(fig_share, use_container_width=True)
+        if board_value is not None:
+            st.dataframe(share.loc[board_value], use_container_width=True)
+
+        st.markdown(f"#### 🎯 Clientes que compraram da concorrência (últimos {CONQUEST_WINDOW_MONTHS} meses)")
+        with stage("lista_conquistas") as rec:
+            conquistas = build_conquest_list(leaderboards, own_brand, CONQUEST_WINDOW_MONTHS, selected_segments, board_dimension, board_value)
+            rec["rows"] = len(conquistas)
+        if conquistas.empty:
+            st.success(f"Nenhum cliente com última compra de outra marca que não {own_brand} no período.")
+        else:
+            ja_clientes = int((conquistas["ComprasMarcaPropria"] > 0).sum())
+            st.warning(f"{len(conquistas)} clientes compraram por último de um concorrente; {ja_clientes} deles já compraram {own_brand} antes.")
+            conquistas = format_report_dates(conquistas, ["UltimaCompra", "UltimaCompraMarcaPropria"])
+            st.dataframe(conquistas, use_container_width=True)
+            export_download_button(
+                "📥 Baixar Lista de Conquistas", "conquistas", "conquistas_concorrencia",
+                lambda: conquistas, extra_key=(own_brand, board_dimension, board_value)
+            )
+
+# --- Desempenho: tempos e caches da execução atual, no log e (opcionalmente) na barra lateral ---
+perf_run.finish()
+write_perf_log(perf_run, origin="app", session_id=st.session_state.perf_session_id, dataset_version=dataset_version, rows=len(df_full))
+if show_perf_panel:
+    with st.sidebar.expander("⏱️ Desempenho (última execução)", expanded=True):
+        st.caption(f"Tempo total do script: {perf_run.total_seconds * 1000:.0f} ms")
+        etapas = pd.DataFrame(perf_run.stages, columns=["stage", "depth", "rows", "seconds"])
+        etapas["Etapa"] = ["  " * depth + nome for nome, depth in zip(etapas["stage"], etapas["depth"])]
+        etapas["Tempo (ms)"] = (etapas["seconds"] * 1000).round(1)
+        etapas["rows"] = etapas["rows"].astype("Int64")
+        st.dataframe(etapas[["Etapa", "rows", "Tempo (ms)"]].rename(columns={"rows": "Linhas"}), use_container_width=True, hide_index=True)
+        if perf_run.cache:
+            caches = pd.DataFrame(perf_run.cache)
+            caches["Status"] = caches["hit"].map({True: "✅ reaproveitado", False: "🔄 recalculado"})
+            st.dataframe(caches[["name", "Status"]].rename(columns={"name": "Cache"}), use_container_width=True, hide_index=True)
@@ -0,0 +1,204 @@
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from emplacamento.cube import build_count_cube, filter_mask
+from emplacamento.export import write_report
+from emplacamento.forecast import forecast_next_purchases
+from emplacamento.groups import build_client_groups, build_group_profiles
+from emplacamento.leaderboards import brand_share, build_conquest_list, build_leaderboards, share_leaderboard
+from emplacamento.loading import normalize_registrations, read_registrations, read_workbook
+from emplacamento.profiles import build_client_profiles
+from emplacamento.reports import build_brand_year_pivot, build_inactive_clients_report
+from emplacamento.search import build_search_index, find_matching_rows
+
+from .synthetic import generate_registrations, write_workbooks
+
+# Mede o tempo de cada etapa do app sobre bases sintéticas e grava o resultado em JSON.
+#   python -m benchmarks.run --rows 10000 100000 1000000
+#   python -m benchmarks.run --rows 100000 --compare benchmarks/results/<execução anterior>.json
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.join(BENCH_DIR, "data")
+RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+# Consultas de busca sorteadas da própria base; o tempo informado é por consulta
+SEARCH_QUERIES = 50
+
+def get_workbook_paths(n_rows, seed):
+    # Planilhas geradas ficam em benchmarks/data e são reaproveitadas entre execuções
+    output_path = os.path.join(DATA_DIR, f"vans_{n_rows}_s{seed}.xlsx")
+    root, ext = os.path.splitext(output_path)
+    paths = [output_path]
+    while os.path.exists(f"{root}_p{len(paths) + 1}{ext}"):
+        paths.append(f"{root}_p{len(paths) + 1}{ext}")
+    if not os.path.exists(output_path):
+        paths = write_workbooks(generate_registrations(n_rows, seed), output_path)
+    return paths
+
+def time_stage(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - start)
+    return result, timings
+
+def stage_result(timings, items=None, per_item=1):
+    result = {
+        "best_s": min(timings) / per_item,
+        "median_s": statistics.median(timings) / per_item,
+        "repeat": len(timings),
+    }
+    if items is not None:
+        result["items"] = int(items)
+    return result
+
+def sample_queries(rng, values, size):
+    values = pd.Series(values).dropna().unique()
+    return list(rng.choice(values, size=min(size, len(values)), replace=False)) if len(values) else []
+
+def run_benchmark(n_rows, seed=0, repeat=3):
+    stages = {}
+    workbook_paths = get_workbook_paths(n_rows, seed)
+    sources = []
+    for path in workbook_paths:
+        with open(path, "rb") as f:
+            sources.append(f.read())
+
+    # Leitura e normalização rodam uma única vez: são as etapas mais caras e alteram o DataFrame
+    raw, timings = time_stage(lambda: pd.concat([read_workbook(source) for source in sources], ignore_index=True), 1)
+    stages["parse"] = stage_result(timings, len(raw))
+    df, timings = time_stage(lambda: normalize_registrations(raw), 1)
+    stages["normalize"] = stage_result(timings, len(df))
+    # Mesmo resultado pelo leitor em blocos (processos paralelos para planilhas grandes)
+    chunked, timings = time_stage(lambda: pd.concat(read_registrations(sources, workers=1), ignore_index=True), 1)
+    stages["parse_normalize_chunked"] = stage_result(timings, len(chunked))
+    # Processos de leitura forçados mesmo em planilhas pequenas: o resultado tem de ser idêntico ao da leitura no processo atual
+    parallel, timings = time_stage(
+        lambda: pd.concat(read_registrations(sources, workers=2, parallel_min_bytes=0), ignore_index=True), 1
+    )
+    stages["parse_normalize_parallel"] = stage_result(timings, len(parallel))
+    pd.testing.assert_frame_equal(parallel, chunked)
+    del chunked, parallel
+
+    top_brand = df["Marca"].value_counts().index[0]
+    top_segment = df["Segmento"].value_counts().index[0]
+    row_mask, timings = time_stage(lambda: filter_mask(df, [top_brand], [top_segment]), repeat)
+    stages["filter"] = stage_result(timings, row_mask.sum())
+
+    search_index, timings = time_stage(lambda: build_search_index(df), repeat)
+    stages["search_index"] = stage_result(timings, len(df))
+    rng = np.random.default_rng(seed)
+    all_rows = np.ones(len(df), dtype=bool)
+    named = df["NOME DO CLIENTE"].str.split().str[0]
+    queries = {
+        "search_plate": sample_queries(rng, df["PLACA"], SEARCH_QUERIES),
+        "search_cnpj": sample_queries(rng, df["CNPJ CLIENTE"], SEARCH_QUERIES),
+        "search_name": sample_queries(rng, named, SEARCH_QUERIES),
+    }
+    for stage, stage_queries in queries.items():
+        matches, timings = time_stage(
+            lambda: sum(len(find_matching_rows(search_index, query, all_rows)) for query in stage_queries), repeat
+        )
+        stages[stage] = stage_result(timings, matches, per_item=max(1, len(stage_queries)))
+
+    forecast, timings = time_stage(lambda: forecast_next_purchases(df), repeat)
+    stages["prediction"] = stage_result(timings, len(forecast))
+    profiles, timings = time_stage(lambda: build_client_profiles(df), repeat)
+    stages["client_profiles"] = stage_result(timings, len(profiles))
+    inactive, timings = time_stage(lambda: build_inactive_clients_report(profiles), repeat)
+    stages["inactive_clients"] = stage_result(timings, len(inactive))
+    groups, timings = time_stage(lambda: build_client_groups(df), repeat)
+    stages["client_groups"] = stage_result(timings, groups["GRUPO_ID"].nunique())
+    group_profiles, timings = time_stage(lambda: build_group_profiles(df, groups), repeat)
+    stages["group_profiles"] = stage_result(timings, len(group_profiles))
+
+    cube, timings = time_stage(lambda: build_count_cube(df), repeat)
+    stages["count_cube"] = stage_result(timings, len(cube["celulas"]))
+    pivot, timings = time_stage(lambda: build_brand_year_pivot(cube["celulas"]), repeat)
+    stages["brand_year_pivot"] = stage_result(timings, pivot.size)
+    leaderboards, timings = time_stage(lambda: build_leaderboards(df), repeat)
+    stages["leaderboards"] = stage_result(timings, len(leaderboards["mensal"]))
+    share, timings = time_stage(lambda: share_leaderboard(brand_share(leaderboards, "NO_CIDADE"), top_brand, 10), repeat)
+    stages["share_leaderboard"] = stage_result(timings, len(share))
+    conquests, timings = time_stage(lambda: build_conquest_list(leaderboards, top_brand), repeat)
+    stages["conquest_list"] = stage_result(timings, len(conquests))
+
+    with tempfile.TemporaryDirectory() as export_dir:
+        for export_format in ("xlsx", "csv"):
+            export_path = os.path.join(export_dir, f"inativos.{export_format}")
+            _, timings = time_stage(lambda: write_report(inactive, export_path, export_format), repeat)
+            stages[f"{export_format}_export"] = stage_result(timings, len(inactive))
+
+    return {
+        "rows": n_rows,
+        "seed": seed,
+        "workbooks": [os.path.basename(path) for path in workbook_paths],
+        "memory_mb": round(df.memory_usage(deep=True).sum() / 2**20, 1),
+        "stages": stages,
+    }
+
+def get_git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BENCH_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return None
+
+def print_results(results, baseline=None):
+    baseline_runs = {run["rows"]: run for run in (baseline or {}).get("runs", [])}
+    for run in results["runs"]:
+        print(f"\n{run['rows']} linhas ({run['memory_mb']} MB)")
+        previous = baseline_runs.get(run["rows"], {}).get("stages", {})
+        for stage, values in run["stages"].items():
+            line = f"  {stage:<24} {values['best_s'] * 1000:>10.3f} ms"
+            if stage in previous and previous[stage]["best_s"] > 0:
+                line += f"   {values['best_s'] / previous[stage]['best_s']:>6.2f}x vs base"
+            print(line)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.run", description="Benchmark por etapa sobre bases sintéticas.")
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000], help="Tamanhos de base (10 mil a 2 milhões)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3, help="Repetições das etapas baratas (vale o melhor tempo)")
+    parser.add_argument("--output", help="Arquivo JSON de saída (padrão: benchmarks/results/bench_<data>_<commit>.json)")
+    parser.add_argument("--compare", help="JSON de uma execução anterior para comparar as etapas")
+    args = parser.parse_args(argv)
+
+    commit = get_git_commit()
+    results = {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "git_commit": commit,
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "machine": platform.platform(),
+        "runs": [run_benchmark(n_rows, args.seed, args.repeat) for n_rows in args.rows],
+    }
+    output_path = args.output or os.path.join(
+        RESULTS_DIR, f"bench_{datetime.now():%Y%m%d_%H%M%S}_{commit or 'sem-commit'}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    with open(output_path, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2, ensure_ascii=False)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+    print_results(results, baseline)
+    print(f"\nResultados gravados em {output_path}")
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
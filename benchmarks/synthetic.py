@@ -0,0 +1,286 @@
+import argparse
+import os
+import re
+
+import numpy as np
+import pandas as pd
+from openpyxl import Workbook
+
+# Gerador de planilhas sintéticas de emplacamentos de VANS com as mesmas colunas da planilha real,
+# para medir desempenho sem usar os dados da empresa.
+#   python -m benchmarks.synthetic --rows 100000 --output benchmarks/data/vans_100000.xlsx
+
+SOURCE_COLUMNS = [
+    "Chassi", "Data emplacamento", "Modelo", "Marca", "Segmento", "Concessionário", "CNPJ CLIENTE",
+    "NOME DO CLIENTE", "ENDEREÇO COMPLETO", "NO_CIDADE", "NU_CEP", "TELEFONE1", "PLACA"
+]
+# Limite de linhas de uma aba do Excel (inclui o cabeçalho); bases maiores são divididas em partes
+EXCEL_MAX_ROWS = 1_048_576
+
+# Participação das marcas e segmentos próxima da planilha real
+BRAND_SHARES = {
+    "RENAULT": 0.369, "M.BENZ": 0.297, "VW": 0.124, "IVECO": 0.122, "FORD": 0.048,
+    "FIAT": 0.034, "PEUGEOT": 0.003, "CITROEN": 0.002, "JAC": 0.0008, "OUTROS": 0.0002,
+}
+SEGMENT_SHARES = {"FURGAO": 0.52, "CHASSI": 0.25, "VAN": 0.19}
+# Parte das linhas traz a marca no lugar do segmento, como acontece na planilha original
+BRAND_AS_SEGMENT_RATE = 0.04
+MODEL_FAMILIES = {
+    "RENAULT": ["MASTER CHASSICAB", "MASTER FURGAO L3", "MASTER FFORMA ES", "MASTER MINIBUS", "KANGOO"],
+    "M.BENZ": ["315CDI STREET F", "417 SPRINTER M", "SPRINTER FFB ES", "516 SPRINTER C", "VITO TOURER"],
+    "VW": ["EXPRESS DRF 4X2", "DELIVERY EXPRESS", "CONSTELLATION VAN"],
+    "IVECO": ["DAILY 35CS", "DAILY 30CS", "DAILY 55C17", "DAILY MINIBUS"],
+    "FORD": ["TRANSIT 350 FURGAO", "TRANSIT CHASSI", "TRANSIT MINIBUS"],
+    "FIAT": ["DUCATO CARGO", "DUCATO MINIBUS", "SCUDO CARGO"],
+    "PEUGEOT": ["BOXER CARGO", "EXPERT CARGO"],
+    "CITROEN": ["JUMPER FURGAO", "JUMPY CARGO"],
+    "JAC": ["V260 CHASSI"],
+    "OUTROS": ["FURGAO ESPECIAL"],
+}
+MODEL_VARIANTS = ["", " L2H2", " L3H2", " 4X2", " TETO ALTO", " ES", " 16L", " LONGO"]
+DEALER_NAMES = [
+    "{brand} DO BRASIL LTDA", "{brand} VEICULOS {city} LTDA", "DE NIGRIS DISTRIBUIDORA DE VEICULOS LTDA",
+    "COMPANHIA BRASILEIRA DE DISTRIBUICAO AUTOMOTIVA S.A", "{city} {brand} COMERCIO DE VEICULOS LTDA",
+]
+CITIES = [
+    "SAO PAULO", "GUARULHOS", "BARUERI", "SAO BERNARDO DO CAMPO", "OSASCO", "MOGI DAS CRUZES", "SANTO ANDRE",
+    "DIADEMA", "MAUA", "BIRITIBA-MIRIM", "CAJAMAR", "COTIA", "TABOAO DA SERRA", "SAO CAETANO DO SUL",
+    "SANTANA DE PARNAIBA", "SUZANO", "ARUJA", "ITAPEVI", "CAIEIRAS", "ITAQUAQUECETUBA", "EMBU DAS ARTES",
+    "BRASILIA", "CARAPICUIBA", "GUARAREMA", "ITAPECERICA DA SERRA", "POA", "FRANCO DA ROCHA", "SANTA ISABEL",
+    "VARGEM GRANDE PAULISTA", "JANDIRA",
+]
+NAME_PREFIXES = [
+    "TRANSPORTES", "LOGISTICA", "EXPRESSO", "AUTO VIACAO", "LOCADORA", "DISTRIBUIDORA", "COMERCIO DE ALIMENTOS",
+    "CONSTRUTORA", "TURISMO", "SERVICOS", "INDUSTRIA", "FRETAMENTO",
+]
+NAME_WORDS = [
+    "SILVA", "SANTOS", "OLIVEIRA", "SOUZA", "PEREIRA", "LIMA", "COSTA", "FERREIRA", "ALMEIDA", "RODRIGUES",
+    "PAULISTA", "BANDEIRANTE", "TIETE", "ATLANTICO", "CENTRAL", "UNIAO", "ESTRELA", "NOVA ERA", "PRIME", "FENIX",
+    "VELOZ", "MODELO", "BRASIL", "AURORA", "CAPITAL", "HORIZONTE", "PIONEIRA", "GLOBAL", "LIDER", "VITORIA",
+]
+NAME_SUFFIXES = ["LTDA", "LTDA", "LTDA", "EIRELI", "S.A.", "S/A", "ME", "EPP"]
+STREET_TYPES = ["RUA", "AVENIDA", "ESTRADA", "TRAVESSA", "ALAMEDA"]
+DISTRICTS = ["CENTRO", "JARDIM VELHO", "VILA NOVA", "JARDIM MARIA ESTELA", "VILA CONGONHAS", "JURUBATUBA", "PARQUE INDUSTRIAL"]
+
+# Fração das linhas com cliente mascarado (CNPJ "***.***.***-**", nome "***", sem cidade/telefone)
+MASKED_ROW_RATE = 0.14
+# Fração de clientes que são filiais de outro cliente (mesma raiz de CNPJ e mesmo nome)
+BRANCH_CLIENT_RATE = 0.08
+# Probabilidade de o cliente repetir a marca preferida a cada compra
+BRAND_LOYALTY = 0.75
+PHONE_MISSING_RATE = 0.03
+DEALER_MISSING_RATE = 0.005
+
+def cnpj_check_digits(bases):
+    # Dígitos verificadores do CNPJ para uma matriz (n, 12) de dígitos
+    weights_first = np.array([5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2])
+    weights_second = np.array([6, 5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2])
+    first = 11 - (bases @ weights_first) % 11
+    first = np.where(first >= 10, 0, first)
+    with_first = np.column_stack([bases, first])
+    second = 11 - (with_first @ weights_second) % 11
+    second = np.where(second >= 10, 0, second)
+    return np.column_stack([with_first, second])
+
+def pick(rng, options, size, shares=None):
+    options = list(options)
+    if shares is not None:
+        shares = np.asarray(shares, dtype=float)
+        shares = shares / shares.sum()
+    return np.asarray(options, dtype=object)[rng.choice(len(options), size=size, p=shares)]
+
+def join_text(*parts):
+    # Concatenação elemento a elemento de arrays de texto e constantes
+    result = ""
+    for part in parts:
+        result = result + (part if isinstance(part, str) else np.asarray(part, dtype=object))
+    return np.asarray(result, dtype=object)
+
+def fill_template(template, **values):
+    # Preenche "{brand} VEICULOS {city}" com arrays de valores, sem formatar linha a linha
+    parts = re.split(r"\{(\w+)\}", template)
+    return join_text(*[values[part] if index % 2 else part for index, part in enumerate(parts)])
+
+def random_digits(rng, size, width, low=0):
+    return pd.Series(rng.integers(low, 10**width, size=size)).astype(str).str.zfill(width).to_numpy(dtype=object)
+
+def generate_clients(rng, n_clients):
+    # Raízes de CNPJ: a maioria única, parte repetida como filial (0002, 0003...) do cliente anterior
+    roots = rng.integers(0, 10**8, size=n_clients)
+    branches = np.ones(n_clients, dtype=np.int64)
+    second_word = np.where(rng.random(n_clients) < 0.5, "", join_text(" ", pick(rng, NAME_WORDS, n_clients)))
+    names = join_text(
+        pick(rng, NAME_PREFIXES, n_clients), " ", pick(rng, NAME_WORDS, n_clients), second_word, " ",
+        pick(rng, NAME_SUFFIXES, n_clients)
+    )
+    is_branch = rng.random(n_clients) < BRANCH_CLIENT_RATE
+    is_branch[0] = False
+    branch_of = np.where(is_branch, np.arange(n_clients) - 1, np.arange(n_clients))
+    for idx in np.flatnonzero(is_branch):
+        parent = branch_of[idx - 1] if is_branch[idx - 1] else idx - 1
+        branch_of[idx] = parent
+        roots[idx] = roots[parent]
+        branches[idx] = branches[idx - 1] + 1 if is_branch[idx - 1] else 2
+        names[idx] = names[parent]
+
+    root_digits = (roots[:, None] // 10 ** np.arange(7, -1, -1)) % 10
+    branch_digits = (branches[:, None] // 10 ** np.arange(3, -1, -1)) % 10
+    digits = cnpj_check_digits(np.column_stack([root_digits, branch_digits]))
+    cnpj_numbers = digits @ (10 ** np.arange(13, -1, -1, dtype=np.int64))
+    cnpjs = pd.Series(cnpj_numbers).astype(str).str.zfill(14).to_numpy(dtype=object)
+
+    n_cities = min(len(CITIES) + max(0, int(np.sqrt(n_clients))), 5570)
+    city_names = CITIES + [f"MUNICIPIO {i:04d}" for i in range(n_cities - len(CITIES))]
+    # Poucas cidades concentram a maioria dos clientes
+    city_shares = 1 / np.arange(1, n_cities + 1) ** 1.1
+    cities = pick(rng, city_names, n_clients, city_shares)
+    addresses = join_text(
+        pick(rng, STREET_TYPES, n_clients), " ", pick(rng, NAME_WORDS, n_clients), ", ",
+        pd.Series(rng.integers(1, 3000, size=n_clients)).astype(str).to_numpy(dtype=object), ", ",
+        pick(rng, DISTRICTS, n_clients), ", ", cities
+    )
+    ceps = rng.integers(1_000_000, 19_999_999, size=n_clients).astype(float)
+    area_codes = pick(rng, ["11", "12", "13", "19", "61"], n_clients, [0.7, 0.08, 0.08, 0.08, 0.06])
+    phones = join_text("(", area_codes, ") ", random_digits(rng, n_clients, 4, low=2000), "-", random_digits(rng, n_clients, 4))
+    phones[rng.random(n_clients) < PHONE_MISSING_RATE] = None
+    preferred_brand = pick(rng, BRAND_SHARES, n_clients, list(BRAND_SHARES.values()))
+    return pd.DataFrame({
+        "cnpj": cnpjs, "nome": names, "cidade": cities, "endereco": addresses, "cep": ceps,
+        "telefone": phones, "marca_preferida": preferred_brand,
+    })
+
+def purchases_per_client(rng, n_rows):
+    # Distribuição de recompra de cauda longa: a maioria compra 1 vez, poucos frotistas compram centenas
+    counts = np.minimum(rng.zipf(2.3, size=max(16, n_rows)), max(1, n_rows // 50))
+    n_clients = int(np.searchsorted(np.cumsum(counts), n_rows)) + 1
+    counts = counts[:n_clients]
+    counts[-1] -= counts.sum() - n_rows
+    return counts
+
+def dirty_cnpj(rng, cnpjs):
+    # Formatos misturados: só dígitos, pontuado, com espaços e células numéricas (sem zeros à esquerda),
+    # com algumas células vazias no meio delas
+    cnpjs = pd.Series(cnpjs, dtype=object)
+    draw = rng.random(len(cnpjs))
+    formatted = draw < 0.2
+    cnpjs[formatted] = cnpjs[formatted].str.replace(r"^(\d{2})(\d{3})(\d{3})(\d{4})(\d{2})$", r"\1.\2.\3/\4-\5", regex=True)
+    spaced = (draw >= 0.2) & (draw < 0.25)
+    cnpjs[spaced] = " " + cnpjs[spaced] + " "
+    numeric = (draw >= 0.25) & (draw < 0.27)
+    cnpjs[numeric] = cnpjs[numeric].map(int)
+    blank = (draw >= 0.27) & (draw < 0.272)
+    cnpjs[blank] = None
+    return cnpjs.to_numpy(dtype=object)
+
+def generate_plates(rng, n_rows):
+    letters = list("ABCDEFGHIJKLMNOPQRSTUVWXYZ")
+    # Placas Mercosul (letra na 5ª posição) e no padrão antigo (só dígitos)
+    fifth = np.where(rng.random(n_rows) < 0.7, pick(rng, letters, n_rows), random_digits(rng, n_rows, 1))
+    plates = pd.Series(join_text(
+        pick(rng, letters, n_rows), pick(rng, letters, n_rows), pick(rng, letters, n_rows),
+        random_digits(rng, n_rows, 1), fifth, random_digits(rng, n_rows, 2)
+    ), dtype=object)
+    # Sujeira de digitação: hífen, minúsculas e espaços
+    draw = rng.random(n_rows)
+    hyphen = draw < 0.15
+    plates[hyphen] = plates[hyphen].str[:3] + "-" + plates[hyphen].str[3:]
+    lower = (draw >= 0.15) & (draw < 0.2)
+    plates[lower] = plates[lower].str.lower()
+    spaced = (draw >= 0.2) & (draw < 0.23)
+    plates[spaced] = plates[spaced] + " "
+    return plates.to_numpy(dtype=object)
+
+def generate_chassis(rng, n_rows):
+    # 17 caracteres: prefixo aleatório + número de série único
+    alphabet = list("ABCDEFGHJKLMNPRSTUVWXYZ0123456789")
+    prefix = join_text("93", *[pick(rng, alphabet, n_rows) for _ in range(7)])
+    serials = pd.Series(rng.permutation(n_rows)).astype(str).str.zfill(8).to_numpy(dtype=object)
+    return join_text(prefix, serials)
+
+def generate_registrations(n_rows, seed=0, start="2023-01-01", end="2025-11-30"):
+    rng = np.random.default_rng(seed)
+    n_masked = int(n_rows * MASKED_ROW_RATE)
+    counts = purchases_per_client(rng, n_rows - n_masked)
+    clients = generate_clients(rng, len(counts))
+    client_rows = rng.permutation(np.repeat(np.arange(len(counts)), counts))
+    rows = clients.iloc[client_rows].reset_index(drop=True)
+
+    brands = np.where(
+        rng.random(len(rows)) < BRAND_LOYALTY,
+        rows["marca_preferida"].to_numpy(),
+        pick(rng, BRAND_SHARES, len(rows), list(BRAND_SHARES.values())),
+    )
+    masked_brands = pick(rng, BRAND_SHARES, n_masked, list(BRAND_SHARES.values()))
+    brands = np.concatenate([brands, masked_brands])
+
+    families = np.empty(n_rows, dtype=object)
+    for brand, brand_families in MODEL_FAMILIES.items():
+        brand_rows = brands == brand
+        families[brand_rows] = pick(rng, brand_families, brand_rows.sum())
+    models = join_text(np.where(brands == "M.BENZ", "I/", ""), brands, "/", families, pick(rng, MODEL_VARIANTS, n_rows))
+    segments = pick(rng, SEGMENT_SHARES, n_rows, list(SEGMENT_SHARES.values()))
+    brand_as_segment = rng.random(n_rows) < BRAND_AS_SEGMENT_RATE
+    segments[brand_as_segment] = brands[brand_as_segment]
+
+    cities = np.concatenate([rows["cidade"].to_numpy(), np.full(n_masked, None, dtype=object)])
+    dealer_city = np.where(pd.isna(cities), "SAO PAULO", cities)
+    dealer_templates = pick(rng, DEALER_NAMES, n_rows, [0.35, 0.25, 0.15, 0.1, 0.15])
+    dealers = np.empty(n_rows, dtype=object)
+    for template in DEALER_NAMES:
+        template_rows = dealer_templates == template
+        dealers[template_rows] = fill_template(template, brand=brands[template_rows], city=dealer_city[template_rows])
+    dealers[rng.random(n_rows) < DEALER_MISSING_RATE] = None
+
+    start, end = pd.Timestamp(start), pd.Timestamp(end)
+    days = rng.integers(0, (end - start).days + 1, size=n_rows)
+    dates = (start + pd.to_timedelta(days, unit="D")).strftime("%d/%m/%Y")
+
+    df = pd.DataFrame({
+        "Chassi": generate_chassis(rng, n_rows),
+        "Data emplacamento": dates,
+        "Modelo": models,
+        "Marca": brands,
+        "Segmento": segments,
+        "Concessionário": dealers,
+        "CNPJ CLIENTE": np.concatenate([dirty_cnpj(rng, rows["cnpj"].to_numpy()), np.full(n_masked, "***.***.***-**", dtype=object)]),
+        "NOME DO CLIENTE": np.concatenate([rows["nome"].to_numpy(), np.full(n_masked, "***", dtype=object)]),
+        "ENDEREÇO COMPLETO": np.concatenate([rows["endereco"].to_numpy(), np.full(n_masked, "; , , ", dtype=object)]),
+        "NO_CIDADE": cities,
+        "NU_CEP": np.concatenate([rows["cep"].to_numpy(), np.full(n_masked, np.nan)]),
+        "TELEFONE1": np.concatenate([rows["telefone"].to_numpy(), np.full(n_masked, None, dtype=object)]),
+        "PLACA": generate_plates(rng, n_rows),
+    })
+    # A planilha real vem ordenada por data de emplacamento
+    order = np.argsort(days, kind="stable")
+    return df.iloc[order].reset_index(drop=True)[SOURCE_COLUMNS]
+
+def write_workbooks(df, output_path):
+    # Grava em modo write_only (memória constante); acima do limite do Excel, divide em partes _p2, _p3...
+    rows_per_part = EXCEL_MAX_ROWS - 1
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    root, ext = os.path.splitext(output_path)
+    paths = []
+    for part, start in enumerate(range(0, len(df), rows_per_part), start=1):
+        path = output_path if part == 1 else f"{root}_p{part}{ext}"
+        workbook = Workbook(write_only=True)
+        sheet = workbook.create_sheet("EMPLACAMENTOS")
+        sheet.append(list(df.columns))
+        chunk = df.iloc[start:start + rows_per_part].astype(object).where(df.iloc[start:start + rows_per_part].notna(), None)
+        for row in chunk.itertuples(index=False, name=None):
+            sheet.append(row)
+        workbook.save(path)
+        paths.append(path)
+    return paths
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.synthetic", description="Gera planilhas sintéticas de emplacamentos de VANS.")
+    parser.add_argument("--rows", type=int, default=100_000, help="Quantidade de emplacamentos")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", required=True, help="Arquivo .xlsx de saída")
+    args = parser.parse_args(argv)
+    for path in write_workbooks(generate_registrations(args.rows, args.seed), args.output):
+        print(path)
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
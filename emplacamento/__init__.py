@@ -0,0 +1,36 @@
+# Motor de dados da consulta de emplacamentos (carga, normalização, busca, perfis e relatórios),
+# utilizável sem Streamlit. Os submódulos são importados sob demanda, no primeiro acesso.
+import importlib
+
+_EXPORTS = {
+    "DataLoadError": "loading",
+    "load_data": "loading",
+    "load_default_dataset": "loading",
+    "load_new_sources": "loading",
+    "append_registrations": "loading",
+    "build_search_index": "search",
+    "find_matching_rows": "search",
+    "batch_lookup": "search",
+    "build_client_profiles": "profiles",
+    "forecast_next_purchases": "forecast",
+    "calculate_next_purchase_prediction": "forecast",
+    "get_sales_pitch": "forecast",
+    "classify_sales_pitch": "forecast",
+    "build_client_groups": "groups",
+    "build_group_profiles": "groups",
+    "build_leaderboards": "leaderboards",
+    "build_conquest_list": "leaderboards",
+    "build_count_cube": "cube",
+    "filter_mask": "cube",
+    "build_inactive_clients_report": "reports",
+    "build_forecast_report": "reports",
+    "build_brand_year_pivot": "reports",
+}
+
+__all__ = list(_EXPORTS)
+
+def __getattr__(name):
+    module_name = _EXPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return getattr(importlib.import_module(f".{module_name}", __name__), name)
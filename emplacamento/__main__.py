@@ -0,0 +1,5 @@
+from .cli import main
+
+# Protegido para que os processos de leitura (multiprocessing "spawn") não executem a CLI de novo
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,70 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from .perf import PerfRun, use_run, write_perf_log
+from .store import open_dataset
+
+# Carga de bases em segundo plano: a sessão continua usando a versão atual enquanto a nova é lida
+# e normalizada em outra thread; o progresso vem das etapas registradas pelo PerfRun da carga.
+LOAD_WORKERS = 2
+LOAD_STAGE_PROGRESS = {
+    "carga_base": (0.05, "Preparando carga"),
+    "leitura_snapshot": (0.1, "Lendo snapshot"),
+    "leitura_planilha": (0.1, "Lendo e normalizando planilha"),
+    "atualizacao_incremental": (0.9, "Atualizando índices"),
+    "construir_placar": (0.95, "Calculando placar de marcas"),
+}
+# Etapas que informam a própria fração concluída (rec["progress"]): a barra avança do início da
+# etapa até este valor
+LOAD_STAGE_PROGRESS_END = {"leitura_planilha": 0.85}
+
+_EXECUTOR = ThreadPoolExecutor(max_workers=LOAD_WORKERS, thread_name_prefix="emplacamento-carga")
+
+class LoadJob:
+    def __init__(self, data_source_key):
+        self.data_source_key = data_source_key
+        self.status = "running"
+        self.lease = None
+        self.error = None
+        self.started_at = time.time()
+        self.perf_run = PerfRun()
+        self._finished = threading.Event()
+
+    @property
+    def done(self):
+        return self._finished.is_set()
+
+    def wait(self, timeout=None):
+        return self._finished.wait(timeout)
+
+    def progress(self):
+        # (fração, texto) a partir da etapa mais recente ainda em andamento
+        fraction, text = 0.0, "Aguardando início da carga"
+        rows = 0
+        for record in list(self.perf_run.stages):
+            if record["stage"] in LOAD_STAGE_PROGRESS and "seconds" not in record:
+                fraction, text = LOAD_STAGE_PROGRESS[record["stage"]]
+                if record["stage"] in LOAD_STAGE_PROGRESS_END and record.get("progress") is not None:
+                    fraction += (LOAD_STAGE_PROGRESS_END[record["stage"]] - fraction) * record["progress"]
+            rows = max(rows, record.get("rows") or 0)
+        elapsed = time.time() - self.started_at
+        details = f"{rows:,} linhas".replace(",", ".") + " · " if rows else ""
+        return fraction, f"{text}... ({details}{elapsed:.0f}s)"
+
+def _run_load(job, loader):
+    with use_run(job.perf_run):
+        try:
+            job.lease = open_dataset(job.data_source_key, loader)
+            job.status = "done"
+        except Exception as e:
+            job.error = e
+            job.status = "failed"
+        finally:
+            write_perf_log(job.perf_run.finish(), origin="carga", data_source_key=job.data_source_key, status=job.status)
+            job._finished.set()
+
+def start_background_load(data_source_key, loader):
+    job = LoadJob(data_source_key)
+    _EXECUTOR.submit(_run_load, job, loader)
+    return job
@@ -0,0 +1,88 @@
+import argparse
+import os
+import sys
+
+REPORT_FILE_NAMES = {
+    "inativos": "clientes_inativos",
+    "previsao": "oportunidades_previstas",
+    "participacao": "participacao_por_cidade",
+    "conquistas": "conquistas_concorrencia",
+}
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="python -m emplacamento",
+        description="Gera os relatórios de clientes inativos e de oportunidades previstas a partir da planilha de emplacamentos.",
+    )
+    parser.add_argument("--input", help="Planilha .xlsx de emplacamentos (padrão: arquivo padrão + extratos de data/extratos)")
+    parser.add_argument("--extract", action="append", default=[], help="Extrato mensal .xlsx a acrescentar à base (pode repetir)")
+    parser.add_argument("--output-dir", default=".", help="Pasta onde os relatórios XLSX serão gravados")
+    parser.add_argument("--report", action="append", choices=list(REPORT_FILE_NAMES), help="Relatório a gerar (padrão: todos)")
+    parser.add_argument("--format", choices=["xlsx", "csv"], default="xlsx", help="Formato dos arquivos gerados")
+    parser.add_argument("--horizon-days", type=int, default=90, help="Horizonte, em dias, das oportunidades previstas")
+    parser.add_argument("--brand", action="append", default=[], help="Filtrar por Marca (pode repetir)")
+    parser.add_argument("--segment", action="append", default=[], help="Filtrar por Segmento (pode repetir)")
+    parser.add_argument("--group", action="store_true", help="Relatórios por grupo de empresas (raiz do CNPJ e razão social)")
+    parser.add_argument("--own-brand", help="Marca própria nos relatórios de participação e conquistas (padrão: M.BENZ, se existir)")
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+
+    # pandas e o restante do motor só são importados depois de validar os argumentos
+    from .cube import filter_mask
+    from .export import write_report
+    from .groups import build_client_groups, build_group_profiles
+    from .leaderboards import brand_share, build_conquest_list, build_leaderboards, get_default_own_brand, share_leaderboard
+    from .normalize import describe_rejected_rows
+    from .loading import DataLoadError, append_registrations, load_data, load_default_dataset, load_new_sources
+    from .perf import stage, start_run, write_perf_log
+    from .profiles import build_client_profiles
+    from .reports import build_forecast_report, build_inactive_clients_report, format_report_dates
+
+    perf_run = start_run()
+    try:
+        df = load_data(args.input) if args.input else load_default_dataset()
+        df = append_registrations(df, load_new_sources(df, args.extract))
+    except DataLoadError as e:
+        print(e, file=sys.stderr)
+        return 1
+    rejected_rows = describe_rejected_rows(df.attrs.get("rejected_rows", {}))
+    if rejected_rows:
+        print("Linhas descartadas: " + "; ".join(f"{reason}: {rows}" for reason, rows in rejected_rows), file=sys.stderr)
+
+    row_mask = filter_mask(df, args.brand, args.segment)
+    with stage("perfis_clientes") as rec:
+        if args.group:
+            profiles = build_group_profiles(df[row_mask], build_client_groups(df))
+        else:
+            profiles = build_client_profiles(df[row_mask])
+        rec["rows"] = len(profiles)
+    own_brand = args.own_brand or get_default_own_brand(sorted(df["Marca"].dropna().unique()))
+    leaderboards = {}
+
+    def get_leaderboards():
+        # Montado só quando algum relatório de participação/conquistas é pedido
+        if not leaderboards:
+            with stage("construir_placar"):
+                leaderboards.update(build_leaderboards(df))
+        return leaderboards
+
+    report_builders = {
+        "inativos": lambda: build_inactive_clients_report(profiles),
+        "previsao": lambda: build_forecast_report(profiles, args.horizon_days),
+        "participacao": lambda: share_leaderboard(brand_share(get_leaderboards(), "NO_CIDADE", args.segment), own_brand).reset_index(),
+        "conquistas": lambda: format_report_dates(
+            build_conquest_list(get_leaderboards(), own_brand, segments=args.segment), ["UltimaCompra", "UltimaCompraMarcaPropria"]
+        ),
+    }
+    os.makedirs(args.output_dir, exist_ok=True)
+    for report in args.report or list(REPORT_FILE_NAMES):
+        output_path = os.path.join(args.output_dir, f"{REPORT_FILE_NAMES[report]}.{args.format}")
+        with stage(f"relatorio_{report}") as rec:
+            table = report_builders[report]()
+            write_report(table, output_path, args.format)
+            rec["rows"] = len(table)
+        print(f"{output_path}: {len(table)} linhas")
+    write_perf_log(perf_run.finish(), origin="cli", dataset_version=df.attrs.get("dataset_version"), rows=len(df))
+    return 0
@@ -0,0 +1,25 @@
+import os
+
+# Caminhos a partir da raiz do projeto, para funcionar tanto no Streamlit quanto em jobs agendados
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_DIR = os.path.join(BASE_DIR, "data")
+DEFAULT_EXCEL_FILE = os.path.join(DATA_DIR, "EMPLACAMENTO ANUAL - VANS.xlsx")
+EXTRACTS_DIR = os.path.join(DATA_DIR, "extratos")
+
+NOME_COLUNA_ENDERECO = "ENDEREÇO COMPLETO"
+NOME_COLUNA_TELEFONE = "TELEFONE1"
+NOME_COLUNA_CONCESSIONARIO = "CONCESSIONÁRIO"
+
+# Snapshots colunares (Parquet) da base já normalizada, indexados pelo hash do arquivo de origem.
+# Incrementar SNAPSHOT_SCHEMA_VERSION sempre que a normalização em load_data mudar.
+SNAPSHOT_DIR = os.path.join(DATA_DIR, "snapshots")
+SNAPSHOT_SCHEMA_VERSION = 5
+
+# Log estruturado (JSON Lines) com os tempos de cada execução; EMPLACAMENTO_PERF_LOG="" desativa
+PERF_LOG_FILE = os.environ.get("EMPLACAMENTO_PERF_LOG", os.path.join(DATA_DIR, "logs", "perf.jsonl"))
+# Ao passar de PERF_LOG_MAX_BYTES o log é renomeado para perf.jsonl.1 (.1 -> .2...), guardando PERF_LOG_BACKUPS arquivos antigos
+PERF_LOG_MAX_BYTES = 10 * 2**20
+PERF_LOG_BACKUPS = 3
+
+# Arquivos de exportação (XLSX/CSV) já gerados, reaproveitados enquanto base e filtros não mudam
+EXPORT_DIR = os.path.join(DATA_DIR, "exports")
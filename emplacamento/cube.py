@@ -0,0 +1,75 @@
+import numpy as np
+import pandas as pd
+
+from .config import NOME_COLUNA_CONCESSIONARIO
+
+CUBE_DIMS = ["Ano", "Mes", "Marca", "Segmento", "NO_CIDADE", NOME_COLUNA_CONCESSIONARIO]
+FILTER_DIMS = ["Marca", "Segmento"]
+PAIR_DIMS = ["Marca", "Segmento", "NO_CIDADE", NOME_COLUNA_CONCESSIONARIO]
+
+def empty_count_cube():
+    return {
+        "celulas": pd.DataFrame(columns=[*CUBE_DIMS, "Count"]),
+        "pares": pd.DataFrame(columns=[*PAIR_DIMS, "Cliente"]),
+        "clientes": pd.Index([], name="CNPJ_NORMALIZED"),
+    }
+
+def extend_count_cube(cube, df_new):
+    # Contagem de emplacamentos por célula Ano x Mes x Marca x Segmento x Cidade x Concessionário.
+    # Clientes distintos: pares únicos (Marca, Segmento, Cidade, Concessionário, cliente) e, a partir
+    # deles, um bitmap de clientes por combinação Marca x Segmento (granularidade dos filtros).
+    # Linhas novas são somadas ao cubo existente sem reprocessar as linhas antigas.
+    new_clients = pd.Index(df_new["CNPJ_NORMALIZED"].unique()).difference(cube["clientes"])
+    clients = cube["clientes"].append(new_clients)
+    new_cells = df_new.groupby(CUBE_DIMS, dropna=False, sort=False, observed=True).size().reset_index(name="Count")
+    new_pairs = df_new[PAIR_DIMS].assign(Cliente=clients.get_indexer(df_new["CNPJ_NORMALIZED"])).drop_duplicates()
+    if cube["celulas"].empty:
+        cells, pairs = new_cells, new_pairs.reset_index(drop=True)
+    else:
+        cells = pd.concat([cube["celulas"], new_cells], ignore_index=True)
+        cells = cells.groupby(CUBE_DIMS, dropna=False, sort=False, observed=True)["Count"].sum().reset_index()
+        pairs = pd.concat([cube["pares"], new_pairs], ignore_index=True).drop_duplicates(ignore_index=True)
+
+    filter_grouped = pairs.groupby(FILTER_DIMS, dropna=False, sort=False, observed=True)
+    filter_combos = filter_grouped.size().reset_index(name="Count")[FILTER_DIMS]
+    client_bits = np.zeros((len(filter_combos), len(clients)), dtype=bool)
+    client_bits[filter_grouped.ngroup().to_numpy(), pairs["Cliente"].to_numpy(dtype=np.int64)] = True
+    return {
+        "celulas": cells,
+        "pares": pairs,
+        "clientes": clients,
+        "combos_filtro": filter_combos,
+        "bitmaps_filtro": np.packbits(client_bits, axis=1),
+        "total_clientes": len(clients),
+    }
+
+def build_count_cube(df):
+    return extend_count_cube(empty_count_cube(), df)
+
+def filter_mask(frame, brands, segments):
+    mask = np.ones(len(frame), dtype=bool)
+    if brands:
+        mask &= frame["Marca"].isin(brands).to_numpy()
+    if segments:
+        mask &= frame["Segmento"].isin(segments).to_numpy()
+    return mask
+
+def count_distinct_clients(cube, brands, segments):
+    if not brands and not segments:
+        return cube["total_clientes"]
+    combo_mask = filter_mask(cube["combos_filtro"], brands, segments)
+    if not combo_mask.any():
+        return 0
+    merged_bitmap = np.bitwise_or.reduce(cube["bitmaps_filtro"][combo_mask], axis=0)
+    return int(np.unpackbits(merged_bitmap).sum())
+
+def cube_drilldown(cube, brands, segments, dimension):
+    # Emplacamentos, clientes distintos e participação por cidade ou concessionário
+    cells = cube["celulas"]
+    counts = cells[filter_mask(cells, brands, segments)].groupby(dimension, dropna=False, observed=True)["Count"].sum()
+    pairs = cube["pares"]
+    pairs = pairs[filter_mask(pairs, brands, segments)]
+    clients = pairs.groupby(dimension, dropna=False, observed=True)["Cliente"].nunique()
+    drilldown = pd.DataFrame({"Emplacamentos": counts, "Clientes Únicos": clients.reindex(counts.index).fillna(0).astype(int)})
+    drilldown["Participação (%)"] = (100 * drilldown["Emplacamentos"] / max(drilldown["Emplacamentos"].sum(), 1)).round(1)
+    return drilldown.sort_values("Emplacamentos", ascending=False)
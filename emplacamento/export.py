@@ -0,0 +1,87 @@
+import csv
+import hashlib
+import os
+import threading
+
+from openpyxl import Workbook
+
+from .config import EXPORT_DIR
+from .perf import record_cache, stage
+
+# Exportação em fluxo: as linhas vão em blocos para um writer de memória constante (openpyxl
+# write_only / csv), sem montar a planilha inteira em um BytesIO. Os arquivos gerados ficam em
+# data/exports, indexados por (versão da base, filtros, relatório, formato).
+EXPORT_FORMATS = {
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "csv": "text/csv",
+}
+EXPORT_CHUNK_ROWS = 10_000
+MAX_EXPORT_FILES = 64
+
+def iter_report_rows(report, chunk_rows=EXPORT_CHUNK_ROWS):
+    # Converte bloco a bloco para objetos Python, trocando NaN/NA/NaT por célula vazia
+    for start in range(0, len(report), chunk_rows):
+        chunk = report.iloc[start:start + chunk_rows].astype(object)
+        yield from chunk.where(chunk.notna(), None).itertuples(index=False, name=None)
+
+def write_xlsx(report, path_or_buffer, sheet_name="Relatorio"):
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(sheet_name)
+    sheet.append([str(col) for col in report.columns])
+    for row in iter_report_rows(report):
+        sheet.append(row)
+    workbook.save(path_or_buffer)
+
+def write_csv(report, path):
+    # Separador ";", vírgula decimal e BOM UTF-8: abre direto no Excel em português com acentos corretos
+    with open(path, "w", newline="", encoding="utf-8-sig") as f:
+        writer = csv.writer(f, delimiter=";")
+        writer.writerow([str(col) for col in report.columns])
+        for row in iter_report_rows(report):
+            writer.writerow([str(value).replace(".", ",") if isinstance(value, float) else value for value in row])
+
+def write_report(report, path, export_format="xlsx"):
+    with stage(f"exportacao_{export_format}", rows=len(report)):
+        if export_format == "csv":
+            write_csv(report, path)
+        else:
+            write_xlsx(report, path)
+    return path
+
+def get_export_path(dataset_version, filters, report_type, export_format):
+    cache_key = repr((dataset_version, filters, report_type, export_format))
+    digest = hashlib.sha256(cache_key.encode()).hexdigest()[:24]
+    return os.path.join(EXPORT_DIR, f"{report_type}_{digest}.{export_format}")
+
+def prune_export_cache():
+    # Mantém apenas os MAX_EXPORT_FILES arquivos usados mais recentemente
+    try:
+        files = [os.path.join(EXPORT_DIR, name) for name in os.listdir(EXPORT_DIR)]
+        files.sort(key=os.path.getmtime, reverse=True)
+        for path in files[MAX_EXPORT_FILES:]:
+            os.remove(path)
+    except OSError:
+        pass
+
+def get_export_file(dataset_version, filters, report_type, export_format, builder):
+    # builder() só é chamado quando o arquivo ainda não existe para essa combinação;
+    # filters deve conter tudo o que muda o conteúdo (marcas, segmentos, data de referência...)
+    export_path = get_export_path(dataset_version, filters, report_type, export_format)
+    if os.path.exists(export_path):
+        record_cache(f"exportacao_{report_type}", True)
+        os.utime(export_path)
+        return export_path
+    record_cache(f"exportacao_{report_type}", False)
+    os.makedirs(EXPORT_DIR, exist_ok=True)
+    # Processo e thread no nome: downloads simultâneos geram o mesmo arquivo sem se sobrescrever
+    tmp_path = f"{export_path}.{os.getpid()}_{threading.get_ident()}.tmp"
+    write_report(builder(), tmp_path, export_format)
+    os.replace(tmp_path, export_path)
+    prune_export_cache()
+    return export_path
+
+def report_frame(report, index_label=None):
+    # Tabelas com índice significativo (ex.: pivô Marca x Ano) exportam o índice como primeira coluna
+    if index_label is None:
+        return report
+    return report.rename_axis(index_label).reset_index()
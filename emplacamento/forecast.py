@@ -0,0 +1,176 @@
+import numpy as np
+import pandas as pd
+from dateutil.relativedelta import relativedelta
+
+MESES_PT = ["Janeiro", "Fevereiro", "Março", "Abril", "Maio", "Junho", "Julho", "Agosto", "Setembro", "Outubro", "Novembro", "Dezembro"]
+
+def predict_next_purchase(valid_purchase_dates):
+    # Retorna (intervalo médio em meses, data prevista). Se as compras forem muito próximas,
+    # a data "prevista" é a própria última compra, como no cálculo original.
+    if not valid_purchase_dates or len(valid_purchase_dates) < 2:
+        return None, None
+    valid_purchase_dates = sorted(valid_purchase_dates)
+    last_purchase_date = valid_purchase_dates[-1]
+    intervals_months = []
+    for i in range(1, len(valid_purchase_dates)):
+        delta = relativedelta(valid_purchase_dates[i], valid_purchase_dates[i-1])
+        months_diff = delta.years * 12 + delta.months
+        days_diff = delta.days
+        if months_diff > 0:
+            intervals_months.append(months_diff)
+        elif months_diff == 0 and days_diff > 15:
+            intervals_months.append(0.5)
+    if not intervals_months:
+        return None, last_purchase_date
+    avg_interval_months = max(1, sum(intervals_months) / len(intervals_months))
+    predicted_next_date = last_purchase_date + relativedelta(months=int(round(avg_interval_months)))
+    return avg_interval_months, predicted_next_date
+
+def format_prediction_text(total_purchases, avg_interval_months, predicted_next_date):
+    if total_purchases < 2:
+        return "Previsão não disponível (histórico insuficiente)."
+    if avg_interval_months is None or pd.isna(avg_interval_months):
+        return "Previsão não disponível (compras muito próximas ou única)."
+    predicted_month_year = f"{MESES_PT[predicted_next_date.month - 1]} de {predicted_next_date.year}"
+    return f"Próxima compra provável em: **{predicted_month_year}** (intervalo médio: {avg_interval_months:.1f} meses)"
+
+def calculate_next_purchase_prediction(valid_purchase_dates):
+    avg_interval_months, predicted_next_date = predict_next_purchase(valid_purchase_dates)
+    total_purchases = len(valid_purchase_dates) if valid_purchase_dates else 0
+    return format_prediction_text(total_purchases, avg_interval_months, predicted_next_date), predicted_next_date
+
+def get_sales_pitch(last_purchase_date, predicted_next_date, total_purchases):
+    today = pd.Timestamp.now().normalize()
+    if not last_purchase_date:
+        return "Primeira vez? 🤔 Sem histórico de compras registrado para este cliente."
+    if not isinstance(last_purchase_date, pd.Timestamp):
+        last_purchase_date = pd.to_datetime(last_purchase_date)
+    months_since_last = relativedelta(today, last_purchase_date).years * 12 + relativedelta(today, last_purchase_date).months
+    last_purchase_str = last_purchase_date.strftime("%d/%m/%Y")
+    if predicted_next_date and isinstance(predicted_next_date, pd.Timestamp):
+        months_to_next = relativedelta(predicted_next_date, today).years * 12 + relativedelta(predicted_next_date, today).months
+        days_to_next = relativedelta(predicted_next_date, today).days
+        predicted_month_year = f"{MESES_PT[predicted_next_date.month - 1]} de {predicted_next_date.year}"
+        if months_to_next < 0 or (months_to_next == 0 and days_to_next < -7):
+            return f"🚨 **Atenção!** A compra prevista para **{predicted_month_year}** pode ter passado! Última compra em {last_purchase_str}. Contato urgente!"
+        elif months_to_next <= 1 and days_to_next >= -7:
+            return f"📈 **Oportunidade Quente!** Próxima compra prevista para **{predicted_month_year}**. Ótimo momento para contato! Última compra em {last_purchase_str}."
+        elif months_to_next <= 3:
+            return f"🗓️ **Planeje-se!** Próxima compra prevista para **{predicted_month_year}**. Prepare sua abordagem! Última compra em {last_purchase_str}."
+        else:
+            return f"⏳ Compra prevista para **{predicted_month_year}**. Mantenha o relacionamento aquecido! Última compra em {last_purchase_str}."
+    else:
+        if months_since_last >= 18:
+            return f"🚨 Alerta de inatividade! Faz {months_since_last} meses desde a última compra ({last_purchase_str}). Hora de reativar esse cliente! 📞"
+        elif months_since_last >= 12:
+            return f"👀 Faz {months_since_last} meses desde a última compra ({last_purchase_str}). Que tal um contato para mostrar novidades?"
+        elif months_since_last >= 6:
+            return f"⏳ Já se passaram {months_since_last} meses ({last_purchase_str}). Bom momento para um follow-up."
+        elif total_purchases > 3:
+            return f"👍 Cliente fiel ({total_purchases} compras)! Última compra em {last_purchase_str}. Mantenha o bom trabalho!"
+        else:
+            return f"✅ Compra recente ({last_purchase_str}). Ótimo para fortalecer o relacionamento!"
+
+# Categorias de abordagem na mesma ordem de urgência das mensagens de get_sales_pitch
+PITCH_BUCKETS = [
+    "🚨 Compra prevista pode ter passado",
+    "📈 Oportunidade quente",
+    "🗓️ Planeje-se",
+    "⏳ Manter relacionamento",
+    "🚨 Inativo há 18+ meses",
+    "👀 Inativo há 12+ meses",
+    "⏳ Follow-up (6+ meses)",
+    "👍 Cliente fiel",
+    "✅ Compra recente",
+]
+
+def add_months(dates, months):
+    # Soma meses como relativedelta: o dia é limitado ao último dia do mês de destino
+    dates = np.asarray(dates, dtype="datetime64[ns]")
+    day_start = dates.astype("datetime64[D]")
+    month_start = dates.astype("datetime64[M]")
+    target_month = month_start + np.asarray(months, dtype=np.int64).astype("timedelta64[M]")
+    month_length = (target_month + 1).astype("datetime64[D]") - target_month.astype("datetime64[D]")
+    day_offset = np.minimum(day_start - month_start.astype("datetime64[D]"), month_length - np.timedelta64(1, "D"))
+    return target_month.astype("datetime64[D]") + day_offset + (dates - day_start)
+
+def relative_months_days(start, end):
+    # Equivalente vetorizado de relativedelta(end, start): (anos * 12 + meses, dias)
+    start = np.asarray(start, dtype="datetime64[ns]")
+    end = np.asarray(end, dtype="datetime64[ns]")
+    valid = ~(np.isnat(start) | np.isnat(end))
+    months = np.where(valid, (end.astype("datetime64[M]") - start.astype("datetime64[M]")).astype(np.int64), 0)
+    shifted = add_months(start, months)
+    forward = end >= start
+    months = np.where(forward & (end < shifted), months - 1, months)
+    months = np.where(~forward & (end > shifted), months + 1, months)
+    days = np.trunc((end - add_months(start, months)) / np.timedelta64(1, "D"))
+    return months, np.where(valid, days, 0).astype(np.int64)
+
+def forecast_next_purchases(df, key="CNPJ_NORMALIZED"):
+    # Intervalo médio e próxima compra prevista de todos os clientes de uma vez, com as mesmas
+    # regras de predict_next_purchase: intervalos de até 15 dias são ignorados e o mínimo é 1 mês
+    columns = ["IntervaloMedioMeses", "ProximaCompraPrevista"]
+    if df.empty:
+        return pd.DataFrame(columns=columns, index=pd.Index([], name=key))
+    client_codes, clients = pd.factorize(df[key])
+    dates = df["Data emplacamento"].to_numpy(dtype="datetime64[ns]")
+    order = np.lexsort((dates, client_codes))
+    client_codes, dates = client_codes[order], dates[order]
+    n_clients = len(clients)
+
+    same_client = client_codes[1:] == client_codes[:-1]
+    months, days = relative_months_days(dates[:-1], dates[1:])
+    intervals = np.where(months > 0, months, np.where((months == 0) & (days > 15), 0.5, np.nan))
+    valid = same_client & ~np.isnan(intervals)
+    interval_sum = np.bincount(client_codes[1:][valid], weights=intervals[valid], minlength=n_clients)
+    interval_count = np.bincount(client_codes[1:][valid], minlength=n_clients)
+    purchase_count = np.bincount(client_codes, minlength=n_clients)
+    last_index = np.flatnonzero(np.append(client_codes[1:] != client_codes[:-1], True))
+    last_purchase = dates[last_index]
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        avg_interval = np.maximum(1, interval_sum / interval_count)
+    avg_interval = np.where(interval_count > 0, avg_interval, np.nan)
+    predicted = add_months(last_purchase, np.where(interval_count > 0, np.round(avg_interval), 0))
+    predicted = np.where(purchase_count >= 2, predicted, np.datetime64("NaT"))
+    return pd.DataFrame(
+        {"IntervaloMedioMeses": avg_interval, "ProximaCompraPrevista": predicted},
+        index=pd.Index(clients, name=key),
+    )
+
+def classify_sales_pitch(profiles, today=None):
+    # Categoria de get_sales_pitch para cada cliente do perfil, calculada em lote
+    today = pd.Timestamp.now().normalize() if today is None else today
+    today_array = np.full(len(profiles), np.datetime64(today, "ns"))
+    predicted = profiles["ProximaCompraPrevista"].to_numpy(dtype="datetime64[ns]")
+    months_since_last, _ = relative_months_days(profiles["UltimaCompra"].to_numpy(dtype="datetime64[ns]"), today_array)
+    months_to_next, days_to_next = relative_months_days(today_array, predicted)
+    has_prediction = ~np.isnat(predicted)
+    conditions = [
+        has_prediction & ((months_to_next < 0) | ((months_to_next == 0) & (days_to_next < -7))),
+        has_prediction & (months_to_next <= 1) & (days_to_next >= -7),
+        has_prediction & (months_to_next <= 3),
+        has_prediction,
+        months_since_last >= 18,
+        months_since_last >= 12,
+        months_since_last >= 6,
+        profiles["TotalCompras"].to_numpy() > 3,
+    ]
+    bucket_codes = np.select(conditions, range(len(conditions)), default=len(conditions))
+    return pd.Series(pd.Categorical.from_codes(bucket_codes, categories=PITCH_BUCKETS, ordered=True), index=profiles.index)
+
+def build_forecast_ranking(profiles, horizon_days, today=None):
+    # Clientes com previsão até hoje + horizonte, ordenados por urgência e proximidade da data
+    today = pd.Timestamp.now().normalize() if today is None else today
+    ranking = profiles[profiles["IntervaloMedioMeses"].notna()]
+    ranking = ranking[ranking["ProximaCompraPrevista"] <= today + pd.Timedelta(days=horizon_days)].copy()
+    ranking["Urgencia"] = classify_sales_pitch(ranking, today)
+    ranking["DiasParaPrevisao"] = (ranking["ProximaCompraPrevista"] - today).dt.days
+    ranking["_distancia"] = ranking["DiasParaPrevisao"].abs()
+    ranking = ranking.sort_values(["Urgencia", "_distancia"]).drop(columns="_distancia")
+    ranking_cols = [
+        "Urgencia", "NOME DO CLIENTE", "CNPJ CLIENTE", "CNPJsNoGrupo", "NO_CIDADE", "UltimaCompra", "TotalCompras",
+        "IntervaloMedioMeses", "ProximaCompraPrevista", "DiasParaPrevisao"
+    ]
+    return ranking.reset_index()[[col for col in ranking_cols if col in ranking.columns]]
@@ -0,0 +1,151 @@
+import re
+
+import numpy as np
+import pandas as pd
+
+from .profiles import build_client_profiles
+from .search import fold_text
+
+# Agrupamento de clientes em grupos de empresas: CNPJs com a mesma raiz (8 primeiros dígitos) são
+# filiais da mesma empresa, e razões sociais com grafias diferentes do mesmo nome (abreviações,
+# pontuação, sufixos como LTDA/S.A., um erro de digitação) também são unidas. Os nomes só são
+# comparados dentro de blocos com a mesma primeira palavra, a mesma inicial da segunda e o mesmo número
+# de palavras, o que mantém o custo próximo do linear. CPFs e documentos mascarados nunca são agrupados.
+NAME_STOPWORDS = {
+    "LTDA", "LIMITADA", "ME", "EPP", "EIRELI", "MEI", "SA", "S", "A", "CIA", "SS", "EI",
+    "DE", "DA", "DO", "DAS", "DOS", "E",
+}
+MIN_NAME_TOKENS = 2
+# Abreviações só contam a partir deste tamanho (LOC./LOCACAO sim, iniciais soltas não)
+MIN_ABBREVIATION = 3
+# Abreviações usuais em razões sociais, aceitas mesmo sem ponto (TRANSP/TRANSPORTES)
+KNOWN_ABBREVIATIONS = {
+    "TRANSP", "TRANSPORT", "COM", "COML", "IND", "INDL", "LOC", "SERV", "SERVS", "DIST", "DISTR", "ADM", "ADMIN",
+    "ASSOC", "COOP", "TUR", "EMP", "EMPR", "EMPREEND", "PART", "PARTIC", "CONST", "CONSTR", "ENG", "IMP", "EXP",
+}
+# Blocos maiores que isso (nomes genéricos) só unem nomes idênticos, sem comparação par a par
+MAX_BLOCK_SIZE = 200
+GROUP_COLS = ["GRUPO_ID", "GrupoNome", "CNPJsNoGrupo"]
+
+def normalize_company_name(name):
+    # Palavras sem pontuação; o ponto final é mantido porque marca abreviação (TRANSP.)
+    tokens = re.findall(r"[A-Z0-9]+\.?", fold_text(name))
+    return tuple(token for token in tokens if token.rstrip(".") not in NAME_STOPWORDS)
+
+def within_one_edit(a, b):
+    # Uma inserção, remoção ou troca de caractere
+    if abs(len(a) - len(b)) > 1:
+        return False
+    if len(a) > len(b):
+        a, b = b, a
+    i = 0
+    while i < len(a) and a[i] == b[i]:
+        i += 1
+    return a[i + 1:] == b[i + 1:] if len(a) == len(b) else a[i:] == b[i + 1:]
+
+def tokens_match(a, b):
+    # Palavras iguais, abreviadas (LOC./LOCACAO, TRANSP/TRANSPORTES) ou com um erro de digitação em
+    # palavras longas. Palavras inteiras que só começam igual (SILVA/SILVANO, ITU/ITUPEVA) não se unem.
+    short, long = sorted((a, b), key=lambda token: len(token.rstrip(".")))
+    short_word, long_word = short.rstrip("."), long.rstrip(".")
+    if short_word == long_word:
+        return True
+    if long_word.startswith(short_word):
+        is_abbreviation = short.endswith(".") or short_word in KNOWN_ABBREVIATIONS
+        return is_abbreviation and len(short_word) >= MIN_ABBREVIATION
+    return len(short_word) >= 5 and within_one_edit(short_word, long_word)
+
+def names_match(tokens_a, tokens_b):
+    # Mesma primeira palavra e mesmo número de palavras, todas equivalentes na mesma posição
+    if tokens_a[0].rstrip(".") != tokens_b[0].rstrip(".") or len(tokens_a) != len(tokens_b):
+        return False
+    return all(tokens_match(a, b) for a, b in zip(tokens_a[1:], tokens_b[1:]))
+
+def find_root(parent, i):
+    root = i
+    while parent[root] != root:
+        root = parent[root]
+    while parent[i] != root:
+        parent[i], i = root, parent[i]
+    return root
+
+def union(parent, a, b):
+    root_a, root_b = find_root(parent, a), find_root(parent, b)
+    if root_a != root_b:
+        parent[max(root_a, root_b)] = min(root_a, root_b)
+
+def get_name_blocks(clients):
+    blocks = {}
+    for client, tokens in clients:
+        if len(tokens) >= MIN_NAME_TOKENS:
+            blocks.setdefault((tokens[0].rstrip("."), tokens[1][0], len(tokens)), []).append((client, tokens))
+    return blocks.values()
+
+def union_similar_names(parent, clients):
+    for members in get_name_blocks(clients):
+        if len(members) < 2:
+            continue
+        if len(members) > MAX_BLOCK_SIZE:
+            first_by_name = {}
+            for client, tokens in members:
+                union(parent, client, first_by_name.setdefault(tuple(token.rstrip(".") for token in tokens), client))
+            continue
+        for i, (client_a, tokens_a) in enumerate(members):
+            for client_b, tokens_b in members[i + 1:]:
+                if find_root(parent, client_a) != find_root(parent, client_b) and names_match(tokens_a, tokens_b):
+                    union(parent, client_a, client_b)
+
+def build_client_groups(df):
+    # Uma linha por CNPJ_NORMALIZED com o grupo resolvido: GRUPO_ID (menor CNPJ do grupo), nome mais
+    # frequente do grupo e quantidade de CNPJs no grupo
+    if df.empty:
+        return pd.DataFrame(columns=GROUP_COLS, index=pd.Index([], name="CNPJ_NORMALIZED"))
+    cnpj_codes, cnpjs = pd.factorize(df["CNPJ_NORMALIZED"])
+    cnpj_text = pd.Series(np.asarray(cnpjs, dtype=object)).astype(str)
+    is_company = cnpj_text.str.fullmatch(r"\d{14}").to_numpy()
+    parent = list(range(len(cnpjs)))
+
+    # Filiais: mesma raiz de CNPJ
+    root_codes, _ = pd.factorize(cnpj_text.str[:8].where(is_company))
+    first_by_root = {}
+    for client, root_code in enumerate(root_codes):
+        if root_code >= 0:
+            union(parent, client, first_by_root.setdefault(root_code, client))
+
+    # Grafias diferentes da mesma razão social, comparando cada par (CNPJ, nome) distinto
+    names = pd.DataFrame({"Cliente": cnpj_codes, "Nome": df["NOME DO CLIENTE"].to_numpy()}).drop_duplicates()
+    names = names[is_company[names["Cliente"].to_numpy()]]
+    normalized = {name: normalize_company_name(name) for name in names["Nome"].unique()}
+    union_similar_names(parent, [(client, normalized[name]) for client, name in zip(names["Cliente"], names["Nome"])])
+
+    group_codes = np.array([find_root(parent, client) for client in range(len(cnpjs))])
+    groups = pd.DataFrame({"Grupo": group_codes, "CNPJ": cnpj_text.to_numpy()}, index=pd.Index(cnpjs, name="CNPJ_NORMALIZED"))
+    by_group = groups.groupby("Grupo")
+    groups["GRUPO_ID"] = by_group["CNPJ"].transform("min")
+    groups["CNPJsNoGrupo"] = by_group["CNPJ"].transform("size")
+    # Nome do grupo: a razão social mais frequente entre os emplacamentos do grupo (empate em ordem alfabética)
+    name_counts = pd.DataFrame({"Grupo": group_codes[cnpj_codes], "Nome": df["NOME DO CLIENTE"].to_numpy()})
+    name_counts = name_counts.groupby(["Grupo", "Nome"]).size().reset_index(name="Linhas")
+    group_names = name_counts.sort_values(["Linhas", "Nome"], ascending=[False, True]).drop_duplicates("Grupo").set_index("Grupo")["Nome"]
+    groups["GrupoNome"] = groups["Grupo"].map(group_names)
+    return groups[GROUP_COLS]
+
+def add_group_ids(df, groups):
+    return df.assign(GRUPO_ID=groups["GRUPO_ID"].reindex(df["CNPJ_NORMALIZED"]).to_numpy())
+
+def get_group_members(groups, group_id):
+    return groups.index[groups["GRUPO_ID"] == group_id]
+
+def build_group_profiles(df, groups):
+    # Mesmo perfil de build_client_profiles, somando todas as filiais/grafias de cada grupo
+    profiles = build_client_profiles(add_group_ids(df, groups), key="GRUPO_ID")
+    group_sizes = groups.drop_duplicates("GRUPO_ID").set_index("GRUPO_ID")["CNPJsNoGrupo"]
+    profiles.insert(profiles.columns.get_loc("CNPJ CLIENTE") + 1, "CNPJsNoGrupo", group_sizes.reindex(profiles.index).to_numpy())
+    return profiles
+
+def update_group_profiles(profiles, df, groups, affected_group_ids):
+    # Recalcula apenas os grupos afetados, reaproveitando as demais linhas do perfil
+    affected_group_ids = pd.Index(affected_group_ids)
+    affected_rows = groups["GRUPO_ID"].reindex(df["CNPJ_NORMALIZED"]).isin(affected_group_ids).to_numpy()
+    rebuilt = build_group_profiles(df[affected_rows], groups)
+    return pd.concat([profiles.drop(index=profiles.index.intersection(affected_group_ids)), rebuilt])
@@ -0,0 +1,165 @@
+import numpy as np
+import pandas as pd
+
+from .config import NOME_COLUNA_CONCESSIONARIO
+
+# Placar de participação de mercado e de conquistas. Na carga são montadas três tabelas pequenas:
+# emplacamentos por mês x segmento x cidade x concessionário x marca, a última compra de cada cliente
+# por marca e a última compra de cada cliente (UltimaMarca). Participação móvel, rankings e listas de
+# conquista são calculados a partir delas, sem percorrer a base; meses novos são somados às tabelas
+# existentes, recalculando só os clientes que voltaram a comprar.
+LEADERBOARD_DIMS = ["NO_CIDADE", NOME_COLUNA_CONCESSIONARIO]
+MONTHLY_DIMS = ["AnoMesNum", "Segmento", *LEADERBOARD_DIMS, "Marca"]
+LAST_PURCHASE_COLS = ["NOME DO CLIENTE", "CNPJ CLIENTE", "NO_CIDADE", NOME_COLUNA_CONCESSIONARIO, "Segmento", "Modelo", "Marca", "Data emplacamento", "AnoMesNum"]
+SHARE_WINDOW_MONTHS = 6
+CONQUEST_WINDOW_MONTHS = 6
+DEFAULT_OWN_BRAND = "M.BENZ"
+SHARE_COLS = ["Emplacamentos", "Participação (%)", "Participação Anterior (%)", "Variação (p.p.)"]
+
+def month_number(year_month):
+    # AAAAMM -> meses corridos, para janelas que atravessam a virada do ano
+    return year_month // 100 * 12 + year_month % 100 - 1
+
+def year_month_from_number(number):
+    return number // 12 * 100 + number % 12 + 1
+
+def empty_leaderboards():
+    return {
+        "mensal": pd.DataFrame(columns=[*MONTHLY_DIMS, "Count"]),
+        "marcas_cliente": pd.DataFrame(columns=["UltimaCompra", "Compras"]),
+        "ultima_compra": pd.DataFrame(columns=LAST_PURCHASE_COLS, index=pd.Index([], name="CNPJ_NORMALIZED")),
+    }
+
+def extend_leaderboards(boards, df_new):
+    new_monthly = df_new.groupby(MONTHLY_DIMS, dropna=False, sort=False, observed=True).size().reset_index(name="Count")
+    new_client_brands = df_new.groupby(["CNPJ_NORMALIZED", "Marca"], sort=False, observed=True)["Data emplacamento"].agg(UltimaCompra="max", Compras="size")
+    # Última compra: o emplacamento mais recente; em datas iguais, o que aparece depois na base
+    last_cols = [col for col in LAST_PURCHASE_COLS if col in df_new.columns]
+    new_last = df_new.sort_values("Data emplacamento", kind="stable").drop_duplicates("CNPJ_NORMALIZED", keep="last")
+    new_last = new_last.set_index("CNPJ_NORMALIZED")[last_cols]
+    if boards["mensal"].empty:
+        return {"mensal": new_monthly, "marcas_cliente": new_client_brands, "ultima_compra": new_last}
+
+    monthly = pd.concat([boards["mensal"], new_monthly], ignore_index=True)
+    monthly = monthly.groupby(MONTHLY_DIMS, dropna=False, sort=False, observed=True)["Count"].sum().reset_index()
+    client_brands = pd.concat([boards["marcas_cliente"], new_client_brands])
+    client_brands = client_brands.groupby(level=["CNPJ_NORMALIZED", "Marca"], sort=False, observed=True).agg({"UltimaCompra": "max", "Compras": "sum"})
+    last_purchase = boards["ultima_compra"]
+    returning = last_purchase.index.intersection(new_last.index)
+    candidates = pd.concat([last_purchase.loc[returning], new_last]).sort_values("Data emplacamento", kind="stable")
+    candidates = candidates[~candidates.index.duplicated(keep="last")]
+    last_purchase = pd.concat([last_purchase.drop(index=returning), candidates])
+    return {"mensal": monthly, "marcas_cliente": client_brands, "ultima_compra": last_purchase}
+
+def build_leaderboards(df):
+    return extend_leaderboards(empty_leaderboards(), df)
+
+def get_latest_month(boards):
+    monthly = boards["mensal"]
+    return int(monthly["AnoMesNum"].max()) if not monthly.empty else None
+
+def get_monthly_counts(boards, segments=(), dimension=None, value=None):
+    monthly = boards["mensal"]
+    mask = np.ones(len(monthly), dtype=bool)
+    if segments:
+        mask &= monthly["Segmento"].isin(segments).to_numpy()
+    if dimension is not None and value is not None:
+        mask &= (monthly[dimension] == value).to_numpy()
+    return monthly[mask]
+
+def brand_share(boards, dimension, segments=(), window=SHARE_WINDOW_MONTHS, end_month=None):
+    # Participação de cada marca em cada cidade/concessionário nos últimos `window` meses, comparada
+    # com a janela imediatamente anterior
+    monthly = get_monthly_counts(boards, segments)
+    if monthly.empty:
+        return pd.DataFrame(columns=SHARE_COLS, index=pd.MultiIndex.from_arrays([[], []], names=[dimension, "Marca"]))
+    months = month_number(monthly["AnoMesNum"].astype(int))
+    end = month_number(end_month or get_latest_month(boards))
+    current = ((months > end - window) & (months <= end)).to_numpy()
+    previous = ((months > end - 2 * window) & (months <= end - window)).to_numpy()
+    counts = pd.DataFrame({
+        dimension: monthly[dimension],
+        "Marca": monthly["Marca"],
+        "Atual": monthly["Count"].where(current, 0),
+        "Anterior": monthly["Count"].where(previous, 0),
+    })[current | previous]
+    grouped = counts.groupby([dimension, "Marca"], observed=True)[["Atual", "Anterior"]].sum()
+    # Só cidades/concessionários com emplacamentos na janela atual
+    grouped = grouped[grouped.groupby(level=dimension, observed=True)["Atual"].transform("sum") > 0]
+    totals = grouped.groupby(level=dimension, observed=True).transform("sum")
+    shares = 100 * grouped / totals.where(totals > 0)
+    share = pd.DataFrame({
+        "Emplacamentos": grouped["Atual"].astype(int),
+        "Participação (%)": shares["Atual"].round(1),
+        # Sem vendas na janela anterior não há como medir ganho ou perda
+        "Participação Anterior (%)": shares["Anterior"].round(1),
+        "Variação (p.p.)": (shares["Atual"] - shares["Anterior"]).round(1),
+    })
+    return share.sort_values([dimension, "Emplacamentos"], ascending=[True, False])
+
+def share_leaderboard(share, own_brand=None, top_n=None):
+    # Uma linha por cidade/concessionário: volume, marca líder, marca que mais ganhou participação e
+    # participação da marca própria, ordenado por volume
+    dimension = share.index.names[0]
+    share = share.reset_index()
+    if share.empty:
+        return pd.DataFrame()
+    totals = share.groupby(dimension, observed=True)["Emplacamentos"].sum().sort_values(ascending=False, kind="stable")
+    leaders = share.sort_values(["Emplacamentos", "Marca"], ascending=[False, True]).drop_duplicates(dimension).set_index(dimension)
+    gainers = share[share["Variação (p.p.)"] > 0].sort_values(["Variação (p.p.)", "Marca"], ascending=[False, True])
+    gainers = gainers.drop_duplicates(dimension).set_index(dimension)
+    board = pd.DataFrame({"Emplacamentos": totals})
+    board["Marca Líder"] = leaders["Marca"].astype(str).reindex(board.index)
+    board["Participação Líder (%)"] = leaders["Participação (%)"].reindex(board.index)
+    board["Marca em Alta"] = gainers["Marca"].astype(str).reindex(board.index).fillna("N/A")
+    board["Ganho (p.p.)"] = gainers["Variação (p.p.)"].reindex(board.index)
+    if own_brand is not None:
+        own = share[share["Marca"] == own_brand].set_index(dimension)
+        board[f"Participação {own_brand} (%)"] = own["Participação (%)"].reindex(board.index).fillna(0)
+        board[f"Variação {own_brand} (p.p.)"] = own["Variação (p.p.)"].reindex(board.index)
+    return board.head(top_n) if top_n else board
+
+def rolling_brand_share(boards, dimension=None, value=None, segments=(), window=SHARE_WINDOW_MONTHS):
+    # Participação móvel mês a mês (soma dos últimos `window` meses) de cada marca, para toda a base
+    # ou para uma cidade/concessionário
+    monthly = get_monthly_counts(boards, segments, dimension, value)
+    if monthly.empty:
+        return pd.DataFrame(columns=["Período", "Marca", "Participação (%)"])
+    months = month_number(monthly["AnoMesNum"].astype(int))
+    counts = monthly.groupby([months.rename("Mes"), "Marca"], observed=True)["Count"].sum().unstack("Marca", fill_value=0)
+    counts = counts.reindex(range(counts.index.min(), counts.index.max() + 1), fill_value=0)
+    rolling = counts.rolling(window, min_periods=1).sum()
+    shares = 100 * rolling.div(rolling.sum(axis=1).where(lambda total: total > 0), axis=0)
+    shares.index = pd.to_datetime(year_month_from_number(shares.index).astype(str), format="%Y%m")
+    shares = shares.rename_axis("Período").rename_axis(columns="Marca").stack().rename("Participação (%)").round(1)
+    return shares.reset_index()
+
+def build_conquest_list(boards, own_brand, months=CONQUEST_WINDOW_MONTHS, segments=(), dimension=None, value=None, end_month=None):
+    # Clientes cuja compra mais recente, nos últimos `months` meses, foi de uma marca concorrente,
+    # com o histórico deles na marca própria (clientes perdidos x nunca conquistados)
+    last_purchase = boards["ultima_compra"]
+    end_month = end_month or get_latest_month(boards)
+    if last_purchase.empty or end_month is None:
+        return pd.DataFrame()
+    end = month_number(end_month)
+    purchase_months = month_number(last_purchase["AnoMesNum"].astype(int))
+    mask = (purchase_months > end - months) & (purchase_months <= end)
+    mask &= last_purchase["Marca"].notna() & (last_purchase["Marca"] != own_brand)
+    if segments:
+        mask &= last_purchase["Segmento"].isin(segments)
+    if dimension is not None and value is not None:
+        mask &= last_purchase[dimension] == value
+    conquests = last_purchase[mask.to_numpy()].drop(columns="AnoMesNum").rename(columns={
+        "Marca": "UltimaMarca", "Modelo": "UltimoModelo", "Data emplacamento": "UltimaCompra"
+    })
+    client_brands = boards["marcas_cliente"]
+    own_purchases = client_brands.xs(own_brand, level="Marca") if own_brand in client_brands.index.get_level_values("Marca") else client_brands.iloc[:0].droplevel("Marca")
+    conquests["ComprasMarcaPropria"] = own_purchases["Compras"].reindex(conquests.index).fillna(0).astype(int).to_numpy()
+    conquests["UltimaCompraMarcaPropria"] = own_purchases["UltimaCompra"].reindex(conquests.index).to_numpy()
+    return conquests.sort_values("UltimaCompra", ascending=False, kind="stable").reset_index(drop=True)
+
+def get_default_own_brand(brands):
+    brands = list(brands)
+    if DEFAULT_OWN_BRAND in brands:
+        return DEFAULT_OWN_BRAND
+    return brands[0] if brands else None
@@ -0,0 +1,291 @@
+import os
+import hashlib
+import logging
+import time
+from io import BytesIO
+
+import numpy as np
+import pandas as pd
+
+from .normalize import merge_rejected_rows, normalize_chunk
+from .perf import record_cache, record_stage, stage
+from .xlsx import read_workbooks
+from .config import (
+    DEFAULT_EXCEL_FILE, EXTRACTS_DIR, NOME_COLUNA_CONCESSIONARIO, NOME_COLUNA_ENDERECO, NOME_COLUNA_TELEFONE,
+    SNAPSHOT_DIR, SNAPSHOT_SCHEMA_VERSION
+)
+
+logger = logging.getLogger(__name__)
+
+def read_source_bytes(file_path_or_buffer):
+    if isinstance(file_path_or_buffer, (str, os.PathLike)):
+        with open(file_path_or_buffer, "rb") as f:
+            return f.read()
+    file_path_or_buffer.seek(0)
+    return file_path_or_buffer.read()
+
+def get_dataset_version(source_bytes):
+    digest = hashlib.sha256(source_bytes).hexdigest()
+    return f"v{SNAPSHOT_SCHEMA_VERSION}_{digest[:32]}"
+
+def get_snapshot_path(dataset_version):
+    return os.path.join(SNAPSHOT_DIR, f"vans_{dataset_version}.parquet")
+
+def read_snapshot(snapshot_path):
+    if not os.path.exists(snapshot_path):
+        return None
+    try:
+        return pd.read_parquet(snapshot_path, memory_map=True)
+    except Exception:
+        # Snapshot corrompido ou ilegível: ignora e reprocessa a planilha
+        return None
+
+def write_snapshot(df, snapshot_path):
+    tmp_path = f"{snapshot_path}.tmp"
+    try:
+        os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+        df.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, snapshot_path)
+    except Exception:
+        # O snapshot é apenas um cache; falhar ao gravá-lo não impede o uso dos dados, mas fica no log
+        # porque todas as cargas seguintes voltarão a ler a planilha
+        logger.warning("Não foi possível gravar o snapshot %s", snapshot_path, exc_info=True)
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+# Colunas de baixa cardinalidade guardadas como categóricas; textos de alta cardinalidade
+# (CNPJ, placa, nome...) em strings Arrow contíguas em vez de objetos Python
+CATEGORY_COLS = ["Marca", "Segmento", "NO_CIDADE", NOME_COLUNA_CONCESSIONARIO, "Modelo"]
+COMPACT_STRING_COLS = [
+    "CNPJ_NORMALIZED", "PLACA_NORMALIZED", "PLACA", "Chassi", "CNPJ CLIENTE", "NOME DO CLIENTE",
+    NOME_COLUNA_ENDERECO, NOME_COLUNA_TELEFONE
+]
+INTEGER_COL_DTYPES = {"Ano": np.int16, "Mes": np.int8, "AnoMesNum": np.int32}
+
+def compact_dataframe(df):
+    for col in CATEGORY_COLS:
+        if col in df.columns:
+            df[col] = df[col].astype("category")
+    for col in COMPACT_STRING_COLS:
+        if col in df.columns:
+            df[col] = df[col].astype(pd.StringDtype("pyarrow"))
+    for col, dtype in INTEGER_COL_DTYPES.items():
+        if col in df.columns:
+            df[col] = df[col].astype(dtype)
+    # Demais colunas de objetos (ex.: NU_CEP com números e textos misturados) viram texto, senão o Parquet recusa
+    for col in df.columns:
+        if pd.api.types.is_object_dtype(df[col].dtype):
+            df[col] = df[col].astype("string")
+    return df
+
+def memory_report(df):
+    # Bytes por coluna na representação compacta x representação original (objetos Python / int64)
+    rows = []
+    for col in df.columns:
+        series = df[col]
+        if pd.api.types.is_integer_dtype(series.dtype):
+            original = series.astype(np.int64)
+        elif pd.api.types.is_datetime64_any_dtype(series.dtype) or pd.api.types.is_float_dtype(series.dtype):
+            original = series
+        else:
+            original = series.astype(object)
+        rows.append({
+            "Coluna": col,
+            "Antes (KB)": original.memory_usage(deep=True, index=False) / 1024,
+            "Depois (KB)": series.memory_usage(deep=True, index=False) / 1024,
+        })
+    report = pd.DataFrame(rows).set_index("Coluna")
+    report.loc["TOTAL"] = report.sum()
+    report["Redução (x)"] = report["Antes (KB)"] / report["Depois (KB)"].where(report["Depois (KB)"] > 0)
+    return report.round(1)
+
+class DataLoadError(ValueError):
+    # Erro de leitura/validação da planilha, com mensagem pronta para exibir ao usuário
+    pass
+
+def read_workbook(source_bytes):
+    return pd.read_excel(BytesIO(source_bytes))
+
+ESSENTIAL_COLS = ["Marca", "Segmento", "NO_CIDADE", "Data emplacamento", "CNPJ CLIENTE", "NOME DO CLIENTE"]
+CONCESSIONARIO_VARIATIONS = ["CONCESSIONÁRIO", "concessionário", "Concessionário", "Concessionaria", "CONCESSIONARIO"]
+
+def check_essential_columns(columns):
+    missing_cols = [col for col in ESSENTIAL_COLS if col not in columns]
+    if missing_cols:
+        raise DataLoadError(f"Erro: Colunas essenciais não encontradas: {', '.join(missing_cols)}")
+
+def rename_dealer_column(columns):
+    # Normalização do nome da coluna Concessionário
+    found_concessionario_col = next((col for col in CONCESSIONARIO_VARIATIONS if col in columns), None)
+    return [NOME_COLUNA_CONCESSIONARIO if col == found_concessionario_col else col for col in columns]
+
+def select_registration_columns(columns, sheet_index):
+    # A primeira aba é obrigatória; as demais só entram na base se tiverem as colunas essenciais
+    if sheet_index > 0 and any(col not in columns for col in ESSENTIAL_COLS):
+        return None
+    check_essential_columns(columns)
+    return rename_dealer_column(columns)
+
+def finalize_registrations(chunks):
+    # Junta os blocos normalizados na ordem original e compacta os tipos da base final
+    if not chunks:
+        raise DataLoadError("O arquivo Excel não contém dados.")
+    rejected_rows = merge_rejected_rows(*(chunk.attrs.get("rejected_rows") for chunk in chunks))
+    df = pd.concat(chunks, ignore_index=True) if len(chunks) > 1 else chunks[0].reset_index(drop=True)
+    compact_dataframe(df)
+    # Linhas descartadas na normalização, por motivo (ver normalize.REJECTION_REASONS)
+    df.attrs = {"rejected_rows": rejected_rows}
+    return df
+
+def normalize_registrations(df):
+    if df.empty:
+        raise DataLoadError("O arquivo Excel não contém dados.")
+    check_essential_columns(df.columns)
+    df.columns = rename_dealer_column(list(df.columns))
+    return finalize_registrations([normalize_chunk(df)])
+
+def read_registrations_with_pandas(sources, on_rows=None):
+    # Leitura aba a aba pelo pd.read_excel: mais lenta, mas só usa APIs públicas. Células como objetos,
+    # como no leitor em blocos (sem converter a coluna inteira para float)
+    dfs = []
+    rows_done = 0
+    transform_seconds = 0.0
+    for source_index, source_bytes in enumerate(sources):
+        chunks = []
+        sheets = pd.read_excel(BytesIO(source_bytes), sheet_name=None, dtype=object)
+        for sheet_index, sheet in enumerate(sheets.values()):
+            columns = select_registration_columns(list(sheet.columns), sheet_index)
+            if columns is None or sheet.empty:
+                continue
+            sheet.columns = columns
+            start = time.perf_counter()
+            chunks.append(normalize_chunk(sheet))
+            transform_seconds += time.perf_counter() - start
+            rows_done += len(chunks[-1])
+            if on_rows:
+                on_rows(rows_done, (source_index + (sheet_index + 1) / len(sheets)) / len(sources), transform_seconds)
+        dfs.append(finalize_registrations(chunks))
+    return dfs
+
+def read_registrations(sources, on_rows=None, workers=None, parallel_min_bytes=None):
+    # Lê e normaliza várias planilhas de uma vez: os blocos de linhas de todas elas são
+    # distribuídos entre os mesmos processos de leitura
+    try:
+        chunks = read_workbooks(
+            sources, select_registration_columns, transform=normalize_chunk, on_rows=on_rows,
+            workers=workers, parallel_min_bytes=parallel_min_bytes
+        )
+    except (AttributeError, ImportError):
+        # O leitor em blocos usa APIs internas do openpyxl/pandas; se uma atualização quebrá-las, a
+        # carga continua pelo pd.read_excel
+        logger.warning("Leitor de planilhas em blocos indisponível; usando pd.read_excel", exc_info=True)
+        return read_registrations_with_pandas(sources, on_rows)
+    return [finalize_registrations(book_chunks) for book_chunks in chunks]
+
+def load_sources(sources):
+    # Uma base por planilha (bytes), reaproveitando snapshots e lendo as demais em paralelo
+    try:
+        dataset_versions = [get_dataset_version(source_bytes) for source_bytes in sources]
+        with stage("leitura_snapshot") as rec:
+            dfs = [read_snapshot(get_snapshot_path(dataset_version)) for dataset_version in dataset_versions]
+            rec["rows"] = sum(len(df) for df in dfs if df is not None)
+        for df in dfs:
+            record_cache("snapshot", df is not None)
+
+        pending = [i for i, df in enumerate(dfs) if df is None]
+        if pending:
+            with stage("leitura_planilha") as rec:
+                normalize_seconds = 0.0
+                def on_rows(rows, fraction, transform_seconds):
+                    nonlocal normalize_seconds
+                    # A fração (bytes das abas já lidos) move a barra de progresso da carga em segundo plano
+                    rec["rows"] = rows
+                    rec["progress"] = fraction
+                    normalize_seconds = transform_seconds
+                new_dfs = read_registrations([sources[i] for i in pending], on_rows=on_rows)
+                rec["rows"] = sum(len(df) for df in new_dfs)
+                # Normalização somada bloco a bloco (com vários processos pode passar do tempo da leitura)
+                record_stage("normalizacao", normalize_seconds, rec["rows"])
+            for i, df in zip(pending, new_dfs):
+                dfs[i] = df
+                write_snapshot(df, get_snapshot_path(dataset_versions[i]))
+
+        for df, dataset_version in zip(dfs, dataset_versions):
+            df.attrs["dataset_version"] = dataset_version
+            df.attrs["source_versions"] = [dataset_version]
+        return dfs
+    except DataLoadError:
+        raise
+    except Exception as e:
+        raise DataLoadError(f"Erro ao carregar/processar o arquivo: {e}") from e
+
+def load_data(file_path_or_buffer):
+    try:
+        source_bytes = read_source_bytes(file_path_or_buffer)
+    except Exception as e:
+        raise DataLoadError(f"Erro ao carregar/processar o arquivo: {e}") from e
+    return load_sources([source_bytes])[0]
+
+def get_registration_keys(df):
+    # Chaves de deduplicação: placa normalizada e chassi (vazios não contam como duplicata)
+    plates = df["PLACA_NORMALIZED"].astype("string").fillna("")
+    if "Chassi" in df.columns:
+        chassis = df["Chassi"].astype("string").str.strip().str.upper().fillna("")
+    else:
+        chassis = pd.Series("", index=df.index, dtype="string")
+    return plates, chassis
+
+def load_new_sources(base_df, sources):
+    # Lê apenas as planilhas cujo conteúdo ainda não faz parte da base
+    seen_versions = set(base_df.attrs.get("source_versions", []))
+    new_sources = []
+    for source in sources:
+        source_bytes = read_source_bytes(source)
+        dataset_version = get_dataset_version(source_bytes)
+        if dataset_version in seen_versions:
+            continue
+        new_sources.append(source_bytes)
+        seen_versions.add(dataset_version)
+    return load_sources(new_sources) if new_sources else []
+
+def append_registrations(base_df, new_dfs):
+    # Acrescenta as linhas novas ao fim da base, descartando emplacamentos já existentes (mesma placa
+    # ou chassi). As linhas antigas mantêm suas posições, o que permite atualizar índices e agregados.
+    if not new_dfs:
+        return base_df
+    new_rows = pd.concat(new_dfs, ignore_index=True)
+    base_plates, base_chassis = get_registration_keys(base_df)
+    plates, chassis = get_registration_keys(new_rows)
+    duplicated = ((plates != "") & (plates.duplicated() | plates.isin(base_plates))) | \
+        ((chassis != "") & (chassis.duplicated() | chassis.isin(base_chassis)))
+    new_rows = new_rows[~duplicated.to_numpy()]
+    source_versions = base_df.attrs.get("source_versions", []) + [df.attrs["dataset_version"] for df in new_dfs]
+    combined = compact_dataframe(pd.concat([base_df, new_rows], ignore_index=True))
+    combined.attrs = {
+        "dataset_version": get_dataset_version("|".join(source_versions).encode()),
+        "source_versions": source_versions,
+        "rejected_rows": merge_rejected_rows(base_df.attrs.get("rejected_rows"), *(df.attrs.get("rejected_rows") for df in new_dfs)),
+        "parent_version": base_df.attrs.get("dataset_version"),
+        "parent_rows": len(base_df),
+    }
+    return combined
+
+def list_extract_files():
+    # Extratos mensais colocados na pasta data/extratos são acrescentados à base padrão
+    if not os.path.isdir(EXTRACTS_DIR):
+        return []
+    return sorted(
+        os.path.join(EXTRACTS_DIR, name) for name in os.listdir(EXTRACTS_DIR)
+        if name.lower().endswith(".xlsx") and not name.startswith("~$")
+    )
+
+def get_default_source_key():
+    # Muda quando o arquivo padrão ou a lista de extratos da pasta mudam
+    extracts = [(os.path.basename(path), os.path.getmtime(path)) for path in list_extract_files()]
+    extracts_signature = hashlib.sha256(repr(extracts).encode()).hexdigest()[:12]
+    return f"default_{os.path.getmtime(DEFAULT_EXCEL_FILE)}_{extracts_signature}"
+
+def load_default_dataset(base_df=None):
+    if base_df is None:
+        base_df = load_data(DEFAULT_EXCEL_FILE)
+    return append_registrations(base_df, load_new_sources(base_df, list_extract_files()))
@@ -0,0 +1,146 @@
+from datetime import date, datetime
+
+import numpy as np
+import pandas as pd
+
+from .config import NOME_COLUNA_CONCESSIONARIO, NOME_COLUNA_ENDERECO, NOME_COLUNA_TELEFONE
+
+# Normalização linha a linha dos emplacamentos, independente entre blocos (pode rodar em outros
+# processos). Datas: células de data nativas do Excel, números de série e textos são tratados
+# separadamente; nos textos o formato é detectado uma vez, numa amostra, e aplicado de forma
+# vetorizada. Textos repetidos (CNPJ, nome, concessionário...) são limpos uma vez por valor distinto.
+DATE_FORMATS = ["%d/%m/%Y", "%d/%m/%Y %H:%M:%S", "%d/%m/%Y %H:%M", "%d-%m-%Y", "%d.%m.%Y", "%Y-%m-%d", "%Y-%m-%d %H:%M:%S", "%d/%m/%y"]
+DATE_SAMPLE_SIZE = 200
+EXCEL_EPOCH = pd.Timestamp("1899-12-30")
+# Números de série do Excel aceitos como data: 1900-01-01 a 9999-12-31
+EXCEL_SERIAL_RANGE = (1, 2_958_465)
+PLACA_SEPARATORS = r"[- ]"
+CNPJ_SEPARATORS = r"[.\\/-]"
+REJECTION_REASONS = {
+    "data_vazia": "Data emplacamento vazia",
+    "data_invalida": "Data emplacamento inválida",
+    "cnpj_vazio": "CNPJ CLIENTE vazio",
+    "nome_vazio": "NOME DO CLIENTE vazio",
+}
+
+def clean_text(series):
+    # strip preservando valores ausentes (astype(str) transformaria NaN no texto "nan")
+    return series.astype("string").str.strip()
+
+def map_distinct(series, func):
+    # Aplica func aos valores distintos e espalha o resultado de volta para as linhas
+    codes, uniques = pd.factorize(series)
+    if len(uniques) == 0:
+        return pd.Series(pd.NA, index=series.index, dtype="string")
+    cleaned = func(pd.Series(uniques, dtype=object))
+    result = cleaned.take(np.where(codes >= 0, codes, 0)).reset_index(drop=True)
+    result[codes < 0] = pd.NA
+    result.index = series.index
+    return result
+
+def clean_distinct_text(series):
+    return map_distinct(series, clean_text)
+
+def detect_date_format(texts):
+    # Primeiro formato que interpreta toda a amostra; None quando nenhum serve (cai na inferência por valor)
+    sample = pd.Series(texts.unique()[:DATE_SAMPLE_SIZE], dtype=object)
+    for date_format in DATE_FORMATS:
+        if pd.to_datetime(sample, format=date_format, errors="coerce").notna().all():
+            return date_format
+    return None
+
+def parse_dates(values):
+    if pd.api.types.is_datetime64_any_dtype(values.dtype):
+        return values.astype("datetime64[us]")
+    parsed = pd.Series(pd.NaT, index=values.index, dtype="datetime64[us]")
+    if pd.api.types.is_numeric_dtype(values.dtype):
+        is_text = np.zeros(len(values), dtype=bool)
+        numbers = values
+    else:
+        kinds = values.map(type, na_action="ignore")
+        native = kinds.isin([datetime, pd.Timestamp, date]).to_numpy()
+        if native.any():
+            parsed[native] = pd.to_datetime(values[native].astype(object))
+        is_text = kinds.isin([str]).to_numpy()
+        numbers = pd.to_numeric(values.where(kinds.isin([int, float, np.int64, np.float64])), errors="coerce")
+
+    # Números de série do Excel (dias desde 30/12/1899), em células sem formato de data
+    numbers = pd.Series(numbers, index=values.index, dtype="float64")
+    serial = numbers.between(*EXCEL_SERIAL_RANGE).to_numpy()
+    if serial.any():
+        parsed[serial] = EXCEL_EPOCH + pd.to_timedelta(numbers[serial], unit="D")
+
+    if is_text.any():
+        texts = clean_text(values[is_text])
+        date_format = detect_date_format(texts.dropna())
+        if date_format is not None:
+            text_dates = pd.to_datetime(texts, format=date_format, errors="coerce")
+        else:
+            text_dates = pd.Series(pd.NaT, index=texts.index, dtype="datetime64[us]")
+        # Textos fora do formato detectado (minoria): demais formatos conhecidos e, por fim, inferência valor a valor
+        for fallback_format in [*DATE_FORMATS, None]:
+            leftover = text_dates.isna() & texts.notna() & (texts != "")
+            if not leftover.any():
+                break
+            if fallback_format is None:
+                text_dates[leftover] = pd.to_datetime(texts[leftover], errors="coerce", dayfirst=True, format="mixed")
+            elif fallback_format != date_format:
+                text_dates[leftover] = pd.to_datetime(texts[leftover], errors="coerce", format=fallback_format)
+        parsed[is_text] = text_dates.to_numpy()
+    return parsed
+
+def normalize_chunk(df):
+    # Normalização da coluna PLACA (coluna M): um strip/upper e uma única substituição de separadores
+    if "PLACA" in df.columns:
+        df["PLACA"] = clean_text(df["PLACA"]).str.upper().fillna("")
+        df["PLACA_NORMALIZED"] = df["PLACA"].str.replace(PLACA_SEPARATORS, "", regex=True)
+    else:
+        df["PLACA"] = ""
+        df["PLACA_NORMALIZED"] = ""
+
+    if NOME_COLUNA_CONCESSIONARIO not in df.columns:
+        df[NOME_COLUNA_CONCESSIONARIO] = "N/A"
+
+    raw_dates = df["Data emplacamento"]
+    df["Data emplacamento"] = parse_dates(raw_dates)
+    df["CNPJ CLIENTE"] = map_distinct(df["CNPJ CLIENTE"], lambda values: clean_text(values).replace("", pd.NA))
+    df["NOME DO CLIENTE"] = map_distinct(df["NOME DO CLIENTE"], lambda values: clean_text(values).replace("", pd.NA))
+    df[NOME_COLUNA_ENDERECO] = clean_distinct_text(df[NOME_COLUNA_ENDERECO]).fillna("N/A") if NOME_COLUNA_ENDERECO in df.columns else "N/A"
+    df[NOME_COLUNA_TELEFONE] = clean_distinct_text(df[NOME_COLUNA_TELEFONE]).fillna("N/A") if NOME_COLUNA_TELEFONE in df.columns else "N/A"
+    df[NOME_COLUNA_CONCESSIONARIO] = clean_distinct_text(df[NOME_COLUNA_CONCESSIONARIO]).fillna("N/A")
+    df["CNPJ_NORMALIZED"] = map_distinct(df["CNPJ CLIENTE"], lambda values: values.astype("string").str.replace(CNPJ_SEPARATORS, "", regex=True))
+
+    # Linhas descartadas, contadas pelo primeiro motivo que as invalida
+    missing_date = raw_dates.isna().to_numpy() | (raw_dates.astype("string").str.strip() == "").fillna(True).to_numpy()
+    checks = {
+        "data_vazia": missing_date,
+        "data_invalida": df["Data emplacamento"].isna().to_numpy() & ~missing_date,
+        "cnpj_vazio": df["CNPJ CLIENTE"].isna().to_numpy(),
+        "nome_vazio": df["NOME DO CLIENTE"].isna().to_numpy(),
+    }
+    rejected = np.zeros(len(df), dtype=bool)
+    rejected_rows = {}
+    for reason, invalid in checks.items():
+        count = int((invalid & ~rejected).sum())
+        if count:
+            rejected_rows[reason] = count
+        rejected |= invalid
+    if rejected.any():
+        df = df[~rejected].copy()
+
+    # Período como números (Ano, Mes e AnoMesNum = AAAAMM); textos só na exibição
+    df["Ano"] = df["Data emplacamento"].dt.year
+    df["Mes"] = df["Data emplacamento"].dt.month
+    df["AnoMesNum"] = df["Ano"] * 100 + df["Mes"]
+    df.attrs["rejected_rows"] = rejected_rows
+    return df
+
+def merge_rejected_rows(*counts):
+    merged = {}
+    for count in counts:
+        for reason, rows in (count or {}).items():
+            merged[reason] = merged.get(reason, 0) + rows
+    return merged
+
+def describe_rejected_rows(rejected_rows):
+    return [(REJECTION_REASONS.get(reason, reason), rows) for reason, rows in rejected_rows.items()]
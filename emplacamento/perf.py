@@ -0,0 +1,112 @@
+import contextvars
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+from .config import PERF_LOG_BACKUPS, PERF_LOG_FILE, PERF_LOG_MAX_BYTES
+
+# Instrumentação leve: cada execução (rerun do Streamlit ou job da CLI) abre um PerfRun no contexto
+# atual; stage() mede tempo e linhas de cada etapa e record_cache() anota acertos/erros de cache.
+# Sem PerfRun ativo, as medições são simplesmente descartadas.
+_CURRENT_RUN = contextvars.ContextVar("emplacamento_perf_run", default=None)
+_LOG_LOCK = threading.Lock()
+
+class PerfRun:
+    def __init__(self):
+        self.started_at = datetime.now()
+        self.start = time.perf_counter()
+        self.total_seconds = None
+        self.depth = 0
+        self.stages = []
+        self.cache = []
+
+    def finish(self):
+        self.total_seconds = time.perf_counter() - self.start
+        return self
+
+    def to_dict(self):
+        return {
+            "started_at": self.started_at.isoformat(timespec="milliseconds"),
+            "total_seconds": self.total_seconds,
+            "stages": self.stages,
+            "cache": self.cache,
+        }
+
+def start_run():
+    run = PerfRun()
+    _CURRENT_RUN.set(run)
+    return run
+
+def get_current_run():
+    return _CURRENT_RUN.get()
+
+@contextmanager
+def use_run(run):
+    # Ativa um PerfRun já existente (ex.: criado pela sessão e preenchido por uma thread de carga)
+    token = _CURRENT_RUN.set(run)
+    try:
+        yield run
+    finally:
+        _CURRENT_RUN.reset(token)
+
+@contextmanager
+def stage(name, rows=None):
+    # O registro é devolvido ao bloco para que ele informe as linhas processadas: rec["rows"] = len(df)
+    run = _CURRENT_RUN.get()
+    record = {"stage": name, "rows": rows, "depth": run.depth if run is not None else 0}
+    if run is not None:
+        # Registrado na ordem de início, para que etapas aninhadas apareçam logo abaixo da etapa-mãe
+        run.stages.append(record)
+        run.depth += 1
+    start = time.perf_counter()
+    try:
+        yield record
+    finally:
+        record["seconds"] = time.perf_counter() - start
+        if run is not None:
+            run.depth -= 1
+
+def record_stage(name, seconds, rows=None):
+    # Etapa medida em partes (ex.: somada entre os processos de leitura), registrada já com o tempo total
+    # sob a etapa aberta no momento
+    run = _CURRENT_RUN.get()
+    if run is not None:
+        run.stages.append({"stage": name, "rows": rows, "depth": run.depth, "seconds": seconds})
+
+def record_cache(name, hit):
+    run = _CURRENT_RUN.get()
+    if run is not None:
+        run.cache.append({"name": name, "hit": bool(hit)})
+
+def perf_panel_enabled_by_env():
+    return os.environ.get("EMPLACAMENTO_PERF", "").strip().lower() in ("1", "true", "sim")
+
+def rotate_perf_log():
+    # perf.jsonl -> perf.jsonl.1 -> ... -> perf.jsonl.N (o mais antigo é descartado)
+    if not os.path.exists(PERF_LOG_FILE) or os.path.getsize(PERF_LOG_FILE) < PERF_LOG_MAX_BYTES:
+        return
+    for index in range(PERF_LOG_BACKUPS - 1, 0, -1):
+        if os.path.exists(f"{PERF_LOG_FILE}.{index}"):
+            os.replace(f"{PERF_LOG_FILE}.{index}", f"{PERF_LOG_FILE}.{index + 1}")
+    if PERF_LOG_BACKUPS > 0:
+        os.replace(PERF_LOG_FILE, f"{PERF_LOG_FILE}.1")
+    else:
+        os.remove(PERF_LOG_FILE)
+
+def write_perf_log(run, **fields):
+    # Uma linha JSON por execução; EMPLACAMENTO_PERF_LOG="" desativa o log
+    if not PERF_LOG_FILE:
+        return
+    try:
+        os.makedirs(os.path.dirname(PERF_LOG_FILE), exist_ok=True)
+        line = json.dumps({**fields, **run.to_dict()}, ensure_ascii=False, default=str)
+        with _LOG_LOCK:
+            rotate_perf_log()
+            with open(PERF_LOG_FILE, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+    except Exception:
+        # O log de desempenho nunca deve derrubar o app
+        pass
@@ -0,0 +1,51 @@
+import pandas as pd
+
+from .config import NOME_COLUNA_CONCESSIONARIO, NOME_COLUNA_ENDERECO, NOME_COLUNA_TELEFONE
+from .forecast import forecast_next_purchases
+
+PROFILE_RECORD_COLS = ["NOME DO CLIENTE", "CNPJ CLIENTE", "NO_CIDADE", NOME_COLUNA_ENDERECO, NOME_COLUNA_TELEFONE]
+
+def get_modes_by_client(df, column, key="CNPJ_NORMALIZED"):
+    # Valores mais frequentes (empates em ordem alfabética, ignorando vazios e "N/A") de cada CNPJ (ou grupo)
+    if column not in df.columns:
+        return pd.Series("N/A", index=pd.Index(df[key].unique(), name=key))
+    values = df[column].dropna().astype(str)
+    values = values[(values != "N/A") & (values != "")]
+    counts = pd.DataFrame({key: df.loc[values.index, key], "Valor": values})
+    counts = counts.groupby([key, "Valor"], sort=False, observed=True).size().reset_index(name="Qtd")
+    counts = counts[counts["Qtd"] == counts.groupby(key)["Qtd"].transform("max")]
+    return counts.sort_values([key, "Valor"]).groupby(key)["Valor"].agg(", ".join)
+
+def build_client_profiles(df, key="CNPJ_NORMALIZED"):
+    # Uma linha por CNPJ_NORMALIZED (ou por GRUPO_ID), com os dados do registro mais recente e as métricas de compra
+    if df.empty:
+        # Colunas já tipadas: perfis vazios (filtro sem linhas) passam pelos mesmos relatórios sem erro
+        return pd.DataFrame({
+            **{col: pd.Series(dtype="string") for col in PROFILE_RECORD_COLS},
+            "PrimeiraCompra": pd.Series(dtype="datetime64[us]"),
+            "UltimaCompra": pd.Series(dtype="datetime64[us]"),
+            "TotalCompras": pd.Series(dtype="int64"),
+            "ModeloMaisComprado": pd.Series(dtype="string"),
+            "ConcessionarioMaisFrequente": pd.Series(dtype="string"),
+            "IntervaloMedioMeses": pd.Series(dtype="float64"),
+            "ProximaCompraPrevista": pd.Series(dtype="datetime64[us]"),
+        }, index=pd.Index([], name=key))
+    df_sorted = df.sort_values("Data emplacamento", ascending=False, kind="stable")
+    record_cols = [col for col in PROFILE_RECORD_COLS if col in df_sorted.columns]
+    profiles = df_sorted.drop_duplicates(key).set_index(key)[record_cols].copy()
+    grouped = df_sorted.groupby(key, sort=False, observed=True)["Data emplacamento"]
+    profiles["PrimeiraCompra"] = grouped.min()
+    profiles["UltimaCompra"] = grouped.max()
+    profiles["TotalCompras"] = grouped.size()
+    profiles["ModeloMaisComprado"] = get_modes_by_client(df_sorted, "Modelo", key).reindex(profiles.index).fillna("N/A")
+    profiles["ConcessionarioMaisFrequente"] = get_modes_by_client(df_sorted, NOME_COLUNA_CONCESSIONARIO, key).reindex(profiles.index).fillna("N/A")
+    forecast = forecast_next_purchases(df_sorted, key).reindex(profiles.index)
+    profiles["IntervaloMedioMeses"] = forecast["IntervaloMedioMeses"]
+    profiles["ProximaCompraPrevista"] = forecast["ProximaCompraPrevista"]
+    return profiles
+
+def update_client_profiles(profiles, df, affected_cnpjs):
+    # Recalcula apenas os clientes afetados, reaproveitando as demais linhas do perfil
+    affected_cnpjs = pd.Index(affected_cnpjs)
+    rebuilt = build_client_profiles(df[df["CNPJ_NORMALIZED"].isin(affected_cnpjs)])
+    return pd.concat([profiles.drop(index=profiles.index.intersection(affected_cnpjs)), rebuilt])
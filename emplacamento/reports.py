@@ -0,0 +1,46 @@
+import pandas as pd
+
+from .forecast import build_forecast_ranking
+
+# CNPJsNoGrupo só existe nos perfis por grupo de empresas
+INACTIVE_REPORT_COLS = ["NOME DO CLIENTE", "CNPJ CLIENTE", "CNPJsNoGrupo", "NO_CIDADE", "UltimaCompra", "TotalCompras", "MesesSemCompra"]
+
+def format_report_dates(report, columns, date_format="%d/%m/%Y"):
+    report = report.copy()
+    for col in columns:
+        report[col] = report[col].dt.strftime(date_format)
+    return report
+
+def build_inactive_clients_report(profiles, today=None):
+    # Clientes que não compraram no ano atual e cuja última compra foi há mais de 12 meses
+    hoje = pd.Timestamp.now() if today is None else today
+    clientes_info = profiles[profiles["UltimaCompra"].notna()].copy()
+    clientes_info["MesesSemCompra"] = ((hoje - clientes_info["UltimaCompra"]) / pd.Timedelta(days=30)).astype(int)
+    clientes_inativos = clientes_info[
+        (clientes_info["UltimaCompra"].dt.year < hoje.year) &
+        (clientes_info["MesesSemCompra"] > 12)
+    ]
+    report_cols = [col for col in INACTIVE_REPORT_COLS if col in clientes_inativos.columns]
+    clientes_inativos = clientes_inativos[report_cols].sort_values(by="MesesSemCompra", ascending=False)
+    return format_report_dates(clientes_inativos.reset_index(drop=True), ["UltimaCompra"])
+
+def build_forecast_report(profiles, horizon_days, today=None):
+    oportunidades = build_forecast_ranking(profiles, horizon_days, today)
+    oportunidades = format_report_dates(oportunidades, ["UltimaCompra", "ProximaCompraPrevista"])
+    oportunidades["IntervaloMedioMeses"] = oportunidades["IntervaloMedioMeses"].round(1)
+    oportunidades["Urgencia"] = oportunidades["Urgencia"].astype(str)
+    return oportunidades
+
+def build_yearly_counts(cube_cells):
+    emplac_por_ano = cube_cells.dropna(subset=["Ano"]).groupby("Ano", observed=True)["Count"].sum().reset_index()
+    emplac_por_ano["Ano"] = emplac_por_ano["Ano"].astype(int)
+    return emplac_por_ano
+
+def build_brand_year_pivot(cube_cells):
+    emplac_marca_ano = cube_cells.dropna(subset=["Ano", "Marca"]).groupby(["Ano", "Marca"], observed=True)["Count"].sum().reset_index()
+    if emplac_marca_ano.empty:
+        return pd.DataFrame()
+    emplac_marca_ano["Ano"] = emplac_marca_ano["Ano"].astype(int)
+    pivot_marca_ano = emplac_marca_ano.pivot(index="Marca", columns="Ano", values="Count").fillna(0).astype(int)
+    pivot_marca_ano["Total"] = pivot_marca_ano.sum(axis=1)
+    return pivot_marca_ano.sort_values("Total", ascending=False)
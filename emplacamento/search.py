@@ -0,0 +1,165 @@
+import csv
+import unicodedata
+from io import StringIO
+
+import numpy as np
+import pandas as pd
+
+from .config import NOME_COLUNA_ENDERECO, NOME_COLUNA_TELEFONE
+from .forecast import classify_sales_pitch
+
+def fold_text(value):
+    # Remove acentos e ignora maiúsculas/minúsculas para comparação de nomes
+    decomposed = unicodedata.normalize("NFKD", str(value))
+    return "".join(ch for ch in decomposed if not unicodedata.combining(ch)).upper()
+
+def normalize_placa_query(query):
+    return query.replace("-", "").replace(" ", "").upper()
+
+def normalize_cnpj_query(query):
+    return ''.join(filter(str.isdigit, str(query)))
+
+def empty_search_index():
+    return {"placa": {}, "cnpj": {}, "nomes": [], "nome_ids": {}, "nome_posicoes": [], "trigramas": {}}
+
+def extend_search_index(index, df_new, offset=0):
+    # Mapas placa/CNPJ -> posições das linhas, e índice de trigramas sobre os nomes distintos.
+    # Retorna um novo índice com as linhas de df_new (posições a partir de offset) sem alterar o original.
+    def merge_positions(mapping, column):
+        merged = dict(mapping)
+        for key, positions in df_new.groupby(column, sort=False, observed=True).indices.items():
+            positions = positions + offset
+            merged[key] = np.concatenate([merged[key], positions]) if key in merged else positions
+        return merged
+
+    folded_names = list(index["nomes"])
+    name_ids = dict(index["nome_ids"])
+    name_positions = list(index["nome_posicoes"])
+    new_trigrams = {}
+    for name, positions in df_new.groupby("NOME DO CLIENTE", sort=False, observed=True).indices.items():
+        positions = positions + offset
+        name_id = name_ids.get(name)
+        if name_id is not None:
+            name_positions[name_id] = np.concatenate([name_positions[name_id], positions])
+            continue
+        name_id = len(folded_names)
+        folded_name = fold_text(name)
+        name_ids[name] = name_id
+        folded_names.append(folded_name)
+        name_positions.append(positions)
+        for trigram in {folded_name[i:i + 3] for i in range(len(folded_name) - 2)}:
+            new_trigrams.setdefault(trigram, []).append(name_id)
+    trigrams = dict(index["trigramas"])
+    for trigram, ids in new_trigrams.items():
+        ids = np.array(ids, dtype=np.int64)
+        trigrams[trigram] = np.concatenate([trigrams[trigram], ids]) if trigram in trigrams else ids
+    return {
+        "placa": merge_positions(index["placa"], "PLACA_NORMALIZED"),
+        "cnpj": merge_positions(index["cnpj"], "CNPJ_NORMALIZED"),
+        "nomes": folded_names,
+        "nome_ids": name_ids,
+        "nome_posicoes": name_positions,
+        "trigramas": trigrams,
+    }
+
+def build_search_index(df):
+    return extend_search_index(empty_search_index(), df)
+
+def search_names(index, query):
+    folded_query = fold_text(query)
+    folded_names = index["nomes"]
+    if len(folded_query) >= 3:
+        postings = []
+        for i in range(len(folded_query) - 2):
+            ids = index["trigramas"].get(folded_query[i:i + 3])
+            if ids is None:
+                return np.array([], dtype=np.int64)
+            postings.append(ids)
+        postings.sort(key=len)
+        candidate_ids = postings[0]
+        for ids in postings[1:]:
+            candidate_ids = np.intersect1d(candidate_ids, ids, assume_unique=True)
+    else:
+        candidate_ids = range(len(folded_names))
+    matched_ids = [name_id for name_id in candidate_ids if folded_query in folded_names[name_id]]
+    if not matched_ids:
+        return np.array([], dtype=np.int64)
+    positions = np.concatenate([index["nome_posicoes"][name_id] for name_id in matched_ids])
+    positions.sort()
+    return positions
+
+def find_matching_rows(index, query, row_mask):
+    # Mesma prioridade da busca original: placa exata, CNPJ exato e, por fim, nome parcial.
+    # Os filtros de Marca/Segmento são aplicados apenas às linhas encontradas.
+    def apply_mask(positions):
+        if positions is None:
+            return np.array([], dtype=np.int64)
+        return positions[row_mask[positions]]
+
+    positions = apply_mask(index["placa"].get(normalize_placa_query(query)))
+    query_cnpj_normalized = normalize_cnpj_query(query)
+    if positions.size == 0 and len(query_cnpj_normalized) >= 11:
+        positions = apply_mask(index["cnpj"].get(query_cnpj_normalized))
+    if positions.size == 0:
+        positions = apply_mask(search_names(index, query))
+    return positions
+
+BATCH_RESULT_COLS = [
+    "Chave", "Encontrado por", "NOME DO CLIENTE", "CNPJ CLIENTE", "CNPJsNoGrupo", "NO_CIDADE", NOME_COLUNA_TELEFONE,
+    NOME_COLUNA_ENDERECO, "TotalCompras", "UltimaCompra", "ProximaCompraPrevista", "Abordagem",
+    "ModeloMaisComprado", "ConcessionarioMaisFrequente"
+]
+
+BATCH_CSV_DELIMITERS = ",;\t"
+
+def read_batch_csv(uploaded_list):
+    # Separador detectado só entre vírgula, ponto e vírgula e tab; sem nenhum deles (o caso mais comum,
+    # uma chave por linha), cada linha é uma chave. Deixar o pandas adivinhar o separador pode
+    # escolher um dígito ou letra e cortar as chaves.
+    text = uploaded_list.getvalue().decode("utf-8-sig", errors="replace")
+    try:
+        delimiter = csv.Sniffer().sniff(text[:4096], delimiters=BATCH_CSV_DELIMITERS).delimiter
+    except csv.Error:
+        return pd.DataFrame({0: text.splitlines()}, dtype=str)
+    return pd.read_csv(StringIO(text), header=None, dtype=str, sep=delimiter)
+
+def read_batch_keys(pasted_text="", uploaded_list=None):
+    # Chaves (CNPJs ou placas) coladas uma por linha/vírgula/ponto e vírgula, ou da 1ª coluna de um CSV/XLSX
+    keys = [key for key in pd.Series(pasted_text).str.split(r"[\n,;\t]+").explode().tolist() if isinstance(key, str)]
+    if uploaded_list is not None:
+        if uploaded_list.name.lower().endswith(".csv"):
+            table = read_batch_csv(uploaded_list)
+        else:
+            table = pd.read_excel(uploaded_list, header=None, dtype=str)
+        column = table.iloc[:, 0].dropna().astype(str).tolist() if not table.empty else []
+        # Ignora uma linha de cabeçalho (ex.: "CNPJ" ou "Placa"), que não tem dígitos
+        if column and not any(ch.isdigit() for ch in column[0]):
+            column = column[1:]
+        keys += column
+    keys = pd.Series(keys, dtype=str).str.strip()
+    return keys[keys != ""].drop_duplicates().tolist()
+
+def batch_lookup(keys, df, row_mask, profiles, groups=None):
+    # Resolve todas as chaves de uma vez, com as mesmas regras da busca individual: placa exata e,
+    # se não houver, CNPJ exato (11+ dígitos). O resultado traz o perfil e a abordagem de cada cliente
+    # ou, com groups (perfis por GRUPO_ID), do grupo de empresas ao qual o CNPJ pertence.
+    lookup = pd.DataFrame({"Chave": pd.Series(keys, dtype=str)})
+    lookup["PLACA_NORMALIZED"] = lookup["Chave"].str.replace("-", "").str.replace(" ", "").str.upper()
+    query_cnpj = lookup["Chave"].str.replace(r"\D", "", regex=True)
+    plates = df.loc[row_mask, ["PLACA_NORMALIZED", "CNPJ_NORMALIZED"]].drop_duplicates("PLACA_NORMALIZED")
+    plates = plates.astype({"PLACA_NORMALIZED": str, "CNPJ_NORMALIZED": str})
+    lookup = lookup.merge(plates, on="PLACA_NORMALIZED", how="left")
+    known_cnpjs = profiles.index if groups is None else groups.index[groups["GRUPO_ID"].isin(profiles.index)]
+    by_cnpj = lookup["CNPJ_NORMALIZED"].isna() & (query_cnpj.str.len() >= 11) & query_cnpj.isin(known_cnpjs)
+    lookup.loc[by_cnpj, "CNPJ_NORMALIZED"] = query_cnpj[by_cnpj]
+    lookup["Encontrado por"] = np.select(
+        [by_cnpj, lookup["CNPJ_NORMALIZED"].notna()], ["CNPJ", "Placa"], default="Não encontrado"
+    )
+    client_profiles = profiles.assign(Abordagem=classify_sales_pitch(profiles).astype(str))
+    profile_key = "CNPJ_NORMALIZED"
+    if groups is not None:
+        profile_key = "GRUPO_ID"
+        lookup["GRUPO_ID"] = groups["GRUPO_ID"].reindex(lookup["CNPJ_NORMALIZED"]).to_numpy()
+    result = lookup.merge(client_profiles, left_on=profile_key, right_index=True, how="left")
+    result["TotalCompras"] = result["TotalCompras"].astype("Int64")
+    return result[[col for col in BATCH_RESULT_COLS if col in result.columns]]
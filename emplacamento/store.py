@@ -0,0 +1,175 @@
+import threading
+import weakref
+from collections import OrderedDict
+
+from .cube import build_count_cube, extend_count_cube
+from .groups import build_client_groups, build_group_profiles, update_group_profiles
+from .leaderboards import build_leaderboards, extend_leaderboards
+from .loading import memory_report
+from .perf import record_cache, stage
+from .profiles import build_client_profiles, update_client_profiles
+from .search import build_search_index, extend_search_index
+
+# Repositório de dados compartilhado por todas as sessões do processo. Cada versão (hash do
+# arquivo) é carregada uma única vez; as sessões guardam apenas um DatasetLease apontando para ela.
+# Estruturas derivadas (índice, perfis, cubo...) ficam junto da versão e são liberadas com ela.
+MAX_FILTERED_ARTIFACTS = 32
+
+_DATASET_STORE = {"lock": threading.RLock(), "versions": {}, "sources": {}, "leases": {}, "load_locks": {}}
+
+class DatasetLease:
+    def __init__(self, dataset_version):
+        self.dataset_version = dataset_version
+
+def get_dataset_store():
+    return _DATASET_STORE
+
+def get_dataset(dataset_version):
+    entry = get_dataset_store()["versions"].get(dataset_version)
+    return entry["df"] if entry is not None else None
+
+def _release_dataset(store, dataset_version):
+    # Chamado quando o DatasetLease de uma sessão é coletado; a última sessão libera a versão
+    with store["lock"]:
+        store["leases"][dataset_version] = store["leases"].get(dataset_version, 0) - 1
+        if store["leases"][dataset_version] > 0:
+            return
+        store["versions"].pop(dataset_version, None)
+        store["leases"].pop(dataset_version, None)
+        for data_source_key in [k for k, v in store["sources"].items() if v == dataset_version]:
+            del store["sources"][data_source_key]
+            # O lock de carga da fonte sai junto, a menos que uma nova carga dela esteja em andamento
+            load_lock = store["load_locks"].get(data_source_key)
+            if load_lock is not None and not load_lock.locked():
+                del store["load_locks"][data_source_key]
+
+def _acquire_dataset(store, dataset_version):
+    store["leases"][dataset_version] = store["leases"].get(dataset_version, 0) + 1
+    lease = DatasetLease(dataset_version)
+    weakref.finalize(lease, _release_dataset, store, dataset_version)
+    return lease
+
+def derive_appended_artifacts(parent_entry, df):
+    # Atualiza incrementalmente os artefatos já construídos da versão anterior com as linhas novas
+    parent_artifacts = parent_entry["artifacts"]
+    parent_rows = df.attrs["parent_rows"]
+    df_new = df.iloc[parent_rows:]
+    artifacts = OrderedDict()
+    if "indice_busca" in parent_artifacts:
+        artifacts["indice_busca"] = extend_search_index(parent_artifacts["indice_busca"], df_new, offset=parent_rows)
+    if "cubo" in parent_artifacts:
+        artifacts["cubo"] = extend_count_cube(parent_artifacts["cubo"], df_new)
+    if "perfis" in parent_artifacts:
+        artifacts["perfis"] = update_client_profiles(parent_artifacts["perfis"], df, df_new["CNPJ_NORMALIZED"].unique())
+    if "placar" in parent_artifacts:
+        artifacts["placar"] = extend_leaderboards(parent_artifacts["placar"], df_new)
+    return artifacts
+
+def acquire_loaded_dataset(data_source_key):
+    # DatasetLease imediato quando a fonte já está carregada no processo; None caso contrário
+    store = get_dataset_store()
+    with store["lock"]:
+        dataset_version = store["sources"].get(data_source_key)
+        if dataset_version in store["versions"]:
+            record_cache("base_dados", True)
+            return _acquire_dataset(store, dataset_version)
+    return None
+
+def open_dataset(data_source_key, loader):
+    # Retorna um DatasetLease para a fonte, carregando-a (uma única vez por processo) se necessário
+    store = get_dataset_store()
+    with store["lock"]:
+        load_lock = store["load_locks"].setdefault(data_source_key, threading.Lock())
+    with load_lock:
+        lease = acquire_loaded_dataset(data_source_key)
+        if lease is not None:
+            return lease
+        record_cache("base_dados", False)
+        with stage("carga_base") as rec:
+            df = loader()
+            rec["rows"] = len(df)
+        dataset_version = df.attrs["dataset_version"]
+        with store["lock"]:
+            parent_entry = store["versions"].get(df.attrs.get("parent_version"))
+        artifacts = OrderedDict()
+        if parent_entry is not None:
+            with stage("atualizacao_incremental") as rec:
+                artifacts = derive_appended_artifacts(parent_entry, df)
+                rec["rows"] = len(df) - df.attrs["parent_rows"]
+        if "placar" not in artifacts:
+            # O placar de marcas é pequeno e montado já na carga, para que rankings e conquistas saiam prontos
+            with stage("construir_placar") as rec:
+                artifacts["placar"] = build_leaderboards(df)
+                rec["rows"] = len(artifacts["placar"]["mensal"])
+        with store["lock"]:
+            # O mesmo conteúdo vindo de outra fonte reaproveita a versão já publicada
+            if dataset_version not in store["versions"]:
+                store["versions"][dataset_version] = {"df": df, "artifacts": artifacts}
+            store["sources"][data_source_key] = dataset_version
+            return _acquire_dataset(store, dataset_version)
+
+def get_dataset_artifact(dataset_version, key, builder):
+    store = get_dataset_store()
+    artifact_name = key[0] + "_filtrado" if isinstance(key, tuple) else key
+    with store["lock"]:
+        entry = store["versions"].get(dataset_version)
+        if entry is not None and key in entry["artifacts"]:
+            entry["artifacts"].move_to_end(key)
+            record_cache(artifact_name, True)
+            return entry["artifacts"][key]
+    record_cache(artifact_name, False)
+    with stage(f"construir_{artifact_name}"):
+        artifact = builder()
+    if entry is None:
+        return artifact
+    with store["lock"]:
+        artifacts = entry["artifacts"]
+        artifacts[key] = artifact
+        # Artefatos por combinação de filtros são descartados do mais antigo para o mais novo
+        filtered_keys = [k for k in artifacts if isinstance(k, tuple)]
+        for old_key in filtered_keys[:-MAX_FILTERED_ARTIFACTS]:
+            del artifacts[old_key]
+    return artifact
+
+def get_memory_report(dataset_version, df):
+    return get_dataset_artifact(dataset_version, "memoria", lambda: memory_report(df))
+
+def get_search_index(dataset_version, df):
+    return get_dataset_artifact(dataset_version, "indice_busca", lambda: build_search_index(df))
+
+def get_full_client_profiles(dataset_version, df):
+    return get_dataset_artifact(dataset_version, "perfis", lambda: build_client_profiles(df))
+
+def get_client_profiles(dataset_version, brands, segments, df, row_mask):
+    full_profiles = get_full_client_profiles(dataset_version, df)
+    if row_mask.all():
+        return full_profiles
+
+    def build_filtered_profiles():
+        # Só os clientes que perderam linhas com o filtro precisam ser recalculados
+        affected_cnpjs = df.loc[~row_mask, "CNPJ_NORMALIZED"].unique()
+        return update_client_profiles(full_profiles, df[row_mask], affected_cnpjs)
+
+    return get_dataset_artifact(dataset_version, ("perfis", tuple(brands), tuple(segments)), build_filtered_profiles)
+
+def get_client_groups(dataset_version, df):
+    return get_dataset_artifact(dataset_version, "grupos", lambda: build_client_groups(df))
+
+def get_group_profiles(dataset_version, brands, segments, df, row_mask):
+    # Perfis por grupo de empresas (filiais e grafias do mesmo cliente somadas)
+    groups = get_client_groups(dataset_version, df)
+    full_profiles = get_dataset_artifact(dataset_version, "perfis_grupo", lambda: build_group_profiles(df, groups))
+    if row_mask.all():
+        return full_profiles
+
+    def build_filtered_profiles():
+        affected_groups = groups["GRUPO_ID"].reindex(df.loc[~row_mask, "CNPJ_NORMALIZED"].unique()).unique()
+        return update_group_profiles(full_profiles, df[row_mask], groups, affected_groups)
+
+    return get_dataset_artifact(dataset_version, ("perfis_grupo", tuple(brands), tuple(segments)), build_filtered_profiles)
+
+def get_count_cube(dataset_version, df):
+    return get_dataset_artifact(dataset_version, "cubo", lambda: build_count_cube(df))
+
+def get_leaderboards(dataset_version, df):
+    return get_dataset_artifact(dataset_version, "placar", lambda: build_leaderboards(df))
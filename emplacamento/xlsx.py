@@ -0,0 +1,239 @@
+import math
+import multiprocessing
+import os
+import re
+import time
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from io import BytesIO
+
+import pandas as pd
+from openpyxl import load_workbook
+
+try:
+    # APIs internas do openpyxl e do pandas: se uma atualização as remover, read_workbooks levanta
+    # ImportError e quem chama volta para o pd.read_excel
+    from openpyxl.worksheet._reader import WorkSheetParser
+    from pandas._libs.parsers import STR_NA_VALUES
+except ImportError:
+    WorkSheetParser = None
+    STR_NA_VALUES = None
+
+# Leitura de planilhas .xlsx em blocos de linhas: o XML de cada aba é descompactado em fluxo e
+# cortado em trechos de ~SEGMENT_BYTES nas fronteiras de <row>. Cada trecho vira um XML válido
+# (cabeçalho da aba + linhas + fechamento), lido pelo parser de streaming do openpyxl e
+# transformado (normalização) em um processo separado. Planilhas pequenas ficam no processo atual.
+SEGMENT_BYTES = 4 * 2**20
+PARALLEL_MIN_BYTES = 16 * 2**20
+PARSE_WORKERS = int(os.environ.get("EMPLACAMENTO_PARSE_WORKERS", 0)) or min(8, os.cpu_count() or 1)
+
+_SHEET_DATA_OPEN = re.compile(rb"<(?:(\w+):)?sheetData\s*(/?)>")
+_SHEET_DATA_CLOSE = re.compile(rb"</(?:\w+:)?sheetData\s*>")
+_ROW_OPEN = re.compile(rb"<(?:\w+:)?row[\s>]")
+_ROOT_TAG = re.compile(rb"<((?:\w+:)?worksheet)[\s>]")
+
+# Contexto de cada pasta de trabalho (strings compartilhadas, estilos de data), carregado uma única
+# vez por processo de leitura
+_BOOKS = []
+
+def get_book_context(source_bytes):
+    # Abre a pasta em modo read-only apenas para obter strings compartilhadas, formatos de data
+    # e o caminho do XML de cada aba
+    workbook = load_workbook(BytesIO(source_bytes), read_only=True, data_only=True)
+    try:
+        sheets = [ws._worksheet_path for ws in workbook.worksheets if hasattr(ws, "_worksheet_path")]
+        shared_strings = next((ws._shared_strings for ws in workbook.worksheets if hasattr(ws, "_shared_strings")), [])
+        return {
+            "sheets": sheets,
+            "shared_strings": list(shared_strings),
+            "epoch": workbook.epoch,
+            "date_formats": workbook._date_formats,
+            "timedelta_formats": workbook._timedelta_formats,
+        }
+    finally:
+        workbook.close()
+
+def iter_sheet_segments(source_bytes, sheet_path, segment_bytes=None):
+    # Gera documentos XML independentes, cada um com um bloco de linhas inteiras da aba
+    segment_bytes = segment_bytes or SEGMENT_BYTES
+    with zipfile.ZipFile(BytesIO(source_bytes)) as archive, archive.open(sheet_path) as src:
+        buffer = b""
+        prologue = None
+        while prologue is None:
+            block = src.read(segment_bytes)
+            buffer += block
+            match = _SHEET_DATA_OPEN.search(buffer)
+            if match is None:
+                if not block:
+                    return
+                continue
+            if match.group(2):
+                # <sheetData/>: aba sem linhas
+                return
+            prefix = match.group(1) + b":" if match.group(1) else b""
+            root = _ROOT_TAG.search(buffer)
+            root_tag = root.group(1) if root else prefix + b"worksheet"
+            prologue = buffer[:match.end()]
+            epilogue = b"</" + prefix + b"sheetData></" + root_tag + b">"
+            buffer = buffer[match.end():]
+
+        while True:
+            block = src.read(segment_bytes)
+            if not block:
+                break
+            buffer += block
+            if len(buffer) < segment_bytes:
+                continue
+            last_row = None
+            for last_row in _ROW_OPEN.finditer(buffer):
+                pass
+            if last_row is None or last_row.start() == 0:
+                continue
+            yield prologue + buffer[:last_row.start()] + epilogue
+            buffer = buffer[last_row.start():]
+
+        close = _SHEET_DATA_CLOSE.search(buffer)
+        rows = buffer[:close.start()] if close else buffer
+        if rows.strip():
+            yield prologue + rows + epilogue
+
+def convert_cell(cell):
+    # Mesmas conversões do pd.read_excel: inteiros sem casas decimais, erros e textos "NA" viram ausentes
+    value = cell["value"]
+    data_type = cell["data_type"]
+    if value is None or data_type == "e":
+        return None
+    if data_type == "n" and isinstance(value, float) and value.is_integer():
+        return int(value)
+    if data_type == "s" and value in STR_NA_VALUES:
+        return None
+    return value
+
+def parse_segment_rows(book, segment):
+    parser = WorkSheetParser(
+        BytesIO(segment), book["shared_strings"], data_only=True, epoch=book["epoch"],
+        date_formats=book["date_formats"], timedelta_formats=book["timedelta_formats"]
+    )
+    rows = []
+    for _, cells in parser.parse():
+        values = {cell["column"]: convert_cell(cell) for cell in cells}
+        if any(value is not None for value in values.values()):
+            rows.append(values)
+    return rows
+
+def rows_to_frame(rows, columns):
+    # Células como objetos: um bloco com um número e uma célula vazia na mesma coluna não vira float
+    # (CNPJ 12345678000190 -> "12345678000190.0"); a normalização decide o tipo de cada coluna
+    width = len(columns)
+    records = [[row.get(col) for col in range(1, width + 1)] for row in rows]
+    return pd.DataFrame(records, columns=columns, dtype=object) if records else pd.DataFrame(columns=columns, dtype=object)
+
+def header_names(header_row):
+    # Cabeçalho como no pandas: colunas sem nome viram "Unnamed: n" e repetidas ganham sufixo ".n"
+    width = max(header_row) if header_row else 0
+    names, seen = [], {}
+    for col in range(1, width + 1):
+        value = header_row.get(col)
+        name = f"Unnamed: {col - 1}" if value is None else str(value)
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        names.append(name)
+    return names
+
+def transform_frame(frame, transform):
+    # Devolve o bloco transformado e os segundos gastos na transformação
+    if transform is None:
+        return frame, 0.0
+    start = time.perf_counter()
+    frame = transform(frame)
+    return frame, time.perf_counter() - start
+
+def read_segment(book, segment, columns, transform=None):
+    return transform_frame(rows_to_frame(parse_segment_rows(book, segment), columns), transform)
+
+def _init_worker(books):
+    _BOOKS[:] = books
+
+def _read_segment_in_worker(book_index, segment, columns, transform):
+    return read_segment(_BOOKS[book_index], segment, columns, transform)
+
+def read_workbooks(sources, select_columns, transform=None, on_rows=None, workers=None, parallel_min_bytes=None):
+    # Lê as abas de várias pastas de trabalho e devolve, para cada pasta, a lista de blocos já
+    # transformados, na ordem das linhas. select_columns(colunas, índice_da_aba) devolve os nomes de
+    # coluna a usar, ou None para ignorar a aba (pode levantar erro para rejeitar o arquivo).
+    # on_rows(linhas, fração, segundos) recebe as linhas lidas, a fração dos bytes das abas já processada
+    # e a soma dos segundos gastos em transform (somados entre os processos).
+    if WorkSheetParser is None or STR_NA_VALUES is None:
+        raise ImportError("Leitor em blocos indisponível nas versões instaladas de openpyxl/pandas")
+    books = [get_book_context(source_bytes) for source_bytes in sources]
+    total_bytes = 0
+    for source_bytes, book in zip(sources, books):
+        with zipfile.ZipFile(BytesIO(source_bytes)) as archive:
+            total_bytes += sum(archive.getinfo(path).file_size for path in book["sheets"])
+    workers = workers or PARSE_WORKERS
+    parallel_min_bytes = PARALLEL_MIN_BYTES if parallel_min_bytes is None else parallel_min_bytes
+    if workers > 1 and total_bytes >= parallel_min_bytes:
+        workers = min(workers, math.ceil(total_bytes / SEGMENT_BYTES))
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(workers, mp_context=context, initializer=_init_worker, initargs=(books,)) as executor:
+            return _read_segments(sources, books, select_columns, transform, on_rows, total_bytes, executor, workers * 2)
+    return _read_segments(sources, books, select_columns, transform, on_rows, total_bytes)
+
+def _read_segments(sources, books, select_columns, transform, on_rows, total_bytes, executor=None, max_pending=0):
+    chunks = [[] for _ in books]
+    pending = {}
+    rows_done = 0
+    bytes_done = 0
+    transform_seconds = 0.0
+
+    def add(book_index, position, result, segment_bytes):
+        nonlocal rows_done, bytes_done, transform_seconds
+        frame, seconds = result
+        chunks[book_index][position] = frame
+        rows_done += len(frame)
+        transform_seconds += seconds
+        # Cada trecho repete o cabeçalho da aba; a fração é limitada a 1
+        bytes_done += segment_bytes
+        if on_rows:
+            on_rows(rows_done, min(1.0, bytes_done / max(total_bytes, 1)), transform_seconds)
+
+    def collect(futures):
+        for future in futures:
+            book_index, position, segment_bytes = pending.pop(future)
+            add(book_index, position, future.result(), segment_bytes)
+
+    for book_index, (source_bytes, book) in enumerate(zip(sources, books)):
+        for sheet_index, sheet_path in enumerate(book["sheets"]):
+            columns = None
+            for segment in iter_sheet_segments(source_bytes, sheet_path):
+                chunks[book_index].append(None)
+                position = len(chunks[book_index]) - 1
+                if columns is None:
+                    # O primeiro bloco de cada aba é lido aqui mesmo: a primeira linha não vazia é o cabeçalho
+                    rows = parse_segment_rows(book, segment)
+                    if not rows:
+                        chunks[book_index].pop()
+                        continue
+                    columns = select_columns(header_names(rows[0]), sheet_index)
+                    if columns is None or len(rows) == 1:
+                        chunks[book_index].pop()
+                        if columns is None:
+                            break
+                        continue
+                    frame = rows_to_frame(rows[1:], columns)
+                    add(book_index, position, transform_frame(frame, transform), len(segment))
+                elif executor is None:
+                    add(book_index, position, read_segment(book, segment, columns, transform), len(segment))
+                else:
+                    future = executor.submit(_read_segment_in_worker, book_index, segment, columns, transform)
+                    pending[future] = (book_index, position, len(segment))
+                    if len(pending) >= max_pending:
+                        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                        collect(done)
+    while pending:
+        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+        collect(done)
+    return chunks